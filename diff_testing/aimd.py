@@ -0,0 +1,107 @@
+import asyncio
+
+# Per-server adaptive concurrency: additive increase, multiplicative decrease
+# of the number of requests a server may have in flight.
+
+DEFAULT_INITIAL_WINDOW = 4
+# Window is multiplied by this on congestion
+DECREASE_FACTOR = 0.5
+# Smoothed latency above LATENCY_INFLATION x baseline counts as congestion
+LATENCY_INFLATION = 2.0
+# Weight of each new latency sample in the moving average
+EWMA_WEIGHT = 0.1
+# Lets the baseline creep up so a server that got permanently slower can recover
+BASELINE_DRIFT = 0.001
+# Seconds between progress lines
+PROGRESS_INTERVAL = 5.0
+
+
+class AimdController:
+    """
+    Gates how many requests one server has in flight. While responses stay
+    healthy the window grows by about one request per window's worth of
+    completions; a failed request (timeout, refused or reset connection) or
+    a smoothed latency above LATENCY_INFLATION times the lowest seen halves
+    it. Only one decrease happens per window of requests, since the ones
+    already in flight when congestion was detected report it too.
+    With adaptive=False the window stays at max_window.
+    """
+
+    def __init__(self, max_window, initial_window=DEFAULT_INITIAL_WINDOW, adaptive=True):
+        self.max_window = max_window
+        self.adaptive = adaptive
+        self.window = float(min(initial_window, max_window) if adaptive else max_window)
+        self.in_flight = 0
+        self.sent = 0
+        self.completed = 0
+        self.errors = 0
+        self.decreases = 0
+        self.latency = None
+        self.baseline = None
+        # Requests sent up to this one were in flight at the last decrease
+        self.recovery_until = 0
+        self.condition = asyncio.Condition()
+
+    def set_max_window(self, max_window):
+        # Changes the cap, clamping the current window to it
+        self.max_window = max_window
+        self.window = float(min(self.window, max_window) if self.adaptive else max_window)
+
+    async def acquire(self):
+        # Waits for room in the window; returns the request's sequence number
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < int(self.window))
+            self.in_flight += 1
+            self.sent += 1
+            return self.sent
+
+    async def release(self, ticket, outcome):
+        async with self.condition:
+            self.in_flight -= 1
+            self.completed += 1
+            failed = outcome is None or outcome["error"] is not None
+            if failed:
+                self.errors += 1
+            if self.adaptive:
+                timing = (outcome or {}).get("timing") or {}
+                self.adjust(ticket, timing.get("total"), failed)
+            self.condition.notify_all()
+
+    def adjust(self, ticket, latency, failed):
+        if latency is not None and not failed:
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency += EWMA_WEIGHT * (latency - self.latency)
+            if self.baseline is None:
+                self.baseline = self.latency
+            else:
+                self.baseline = min(self.latency, self.baseline * (1 + BASELINE_DRIFT))
+
+        congested = failed or (self.baseline and self.latency > self.baseline * LATENCY_INFLATION)
+        if not congested:
+            self.window = min(self.max_window, self.window + 1 / self.window)
+        elif ticket > self.recovery_until:
+            self.window = max(1.0, self.window * DECREASE_FACTOR)
+            self.recovery_until = self.sent
+            self.decreases += 1
+
+    async def track(self, fetch):
+        # Runs fetch() (returning an outcome) inside the window
+        ticket = await self.acquire()
+        outcome = None
+        try:
+            outcome = await fetch()
+            return outcome
+        finally:
+            await self.release(ticket, outcome)
+
+
+async def report_progress(controllers, interval=PROGRESS_INTERVAL):
+    # Prints each server's completed requests and current window until cancelled
+    while True:
+        await asyncio.sleep(interval)
+        print("Progress: " + ", ".join(
+            f"{name} {controller.completed} done (window {controller.window:.1f}, {controller.errors} errors)"
+            for name, controller in controllers.items()
+        ))
@@ -0,0 +1,102 @@
+import os
+import re
+import time
+import random
+import argparse
+import tempfile
+import urllib.parse
+import response_comparison
+
+# Benchmarks parsing of per-test log files: the original four-regex,
+# serial parser against response_comparison's single-pass parallel one.
+
+
+def legacy_parse_log_file(log_path):
+    # The parser response_comparison.py used before, kept here as the baseline
+    data = {
+        'test_case': None,
+        'status_code': None,
+        'resolved_uri': None
+    }
+
+    with open(log_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            match_test_case = re.match(r'^Test case\s+(\d+):', line.strip())
+            if match_test_case:
+                data['test_case'] = int(match_test_case.group(1))
+                continue
+
+            match_success = re.match(r'^Request to .* status code:\s+(\d+)', line.strip())
+            if match_success:
+                data['status_code'] = int(match_success.group(1))
+                continue
+
+            match_error = re.match(r'^Request to .* returned error:\s+(\d+)', line.strip())
+            if match_error:
+                data['status_code'] = int(match_error.group(1))
+                continue
+
+            match_resolved = re.match(r'^Resolved URI:\s+(.*)$', line.strip())
+            if match_resolved:
+                if data['status_code'] and data['status_code'] < 400:
+                    parsed = urllib.parse.urlparse(match_resolved.group(1))
+                    combined = parsed.path
+                    if parsed.query:
+                        combined += "?" + parsed.query
+                    data['resolved_uri'] = combined
+
+    return data
+
+
+# Write `count` log files shaped like the sender's output into folder
+def write_synthetic_logs(folder, count):
+    random.seed(0)
+    for i in range(count):
+        full_uri = f"http://localhost:8080/a/{i}/./b.txt"
+        with open(os.path.join(folder, f"{i}.json"), 'w', encoding="utf-8") as log:
+            log.write(f"Test case {i}: a/{i}/./b.txt\n")
+            if random.random() < 0.5:
+                log.write(f"Request to {full_uri} completed with status code: 200\n")
+                log.write(f"Resolved URI: http://localhost:8080/a/{i}/b.txt\n")
+                log.write(f"Response content from {full_uri}: " + "x" * 200 + "\n\n")
+            else:
+                log.write(f"Request to {full_uri} returned error: 404\n")
+                log.write(f"Resolved URL: http://localhost:8080/a/{i}/b.txt\n\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark log file parsing for response_comparison.py.")
+    parser.add_argument('--results_dir', help="Folder of {i}.json logs to parse (default: generate synthetic logs)")
+    parser.add_argument('--count', type=int, default=20000, help="Number of synthetic log files")
+    parser.add_argument('--workers', type=int, help="Number of parser processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = args.results_dir
+        if folder is None:
+            folder = tmp
+            write_synthetic_logs(folder, args.count)
+        log_files = response_comparison.list_log_files(folder)
+
+        start = time.perf_counter()
+        for _, path in log_files:
+            legacy_parse_log_file(path)
+        legacy = time.perf_counter() - start
+
+        start = time.perf_counter()
+        response_comparison.parse_log_chunk(log_files)
+        single_pass = time.perf_counter() - start
+
+        start = time.perf_counter()
+        response_comparison.load_all_results({"server": folder}, args.workers)
+        parallel = time.perf_counter() - start
+
+    n = len(log_files)
+    print(f"{n} log files")
+    print(f"  legacy serial parser:   {n / legacy:10.0f} files/s")
+    print(f"  single-pass, serial:    {n / single_pass:10.0f} files/s")
+    print(f"  single-pass, parallel:  {n / parallel:10.0f} files/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import os
+import asyncio
+import argparse
+import corpus
+import request_engine
+import result_store
+
+# Benchmarks requests/second of each request_engine transport against one
+# running server, e.g. a container started by differential_test_script.py.
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare request throughput of the request_engine transports.")
+    parser.add_argument('--url', required=True, help="Server to send to (e.g., http://localhost:8080)")
+    parser.add_argument('--test_files', nargs='+', required=True, help="Relative path test files")
+    parser.add_argument('--concurrency', type=int, default=request_engine.DEFAULT_CONCURRENCY)
+    parser.add_argument('--pipeline_depth', type=int, default=request_engine.raw_sender.DEFAULT_PIPELINE_DEPTH)
+    parser.add_argument('--max_streams', type=int, default=request_engine.DEFAULT_MAX_STREAMS)
+    parser.add_argument('--transports', nargs='+', choices=request_engine.TRANSPORTS, default=request_engine.TRANSPORTS)
+    parser.add_argument(
+        '--log_dir',
+        help="Also store each transport's outcomes in <log_dir>/<transport>/ for response_comparison.py"
+    )
+    args = parser.parse_args()
+
+    for transport in args.transports:
+        writer = None
+        sink = lambda outcome: None
+        if args.log_dir:
+            os.makedirs(os.path.join(args.log_dir, transport), exist_ok=True)
+            writer = result_store.ResultWriter(os.path.join(args.log_dir, transport))
+            sink = writer.append
+        tests = corpus.dedupe(corpus.build_http1_requests(args.url, corpus.iter_sourced_test_cases(args.test_files)))
+        try:
+            stats = asyncio.run(request_engine.send_requests(
+                args.url, tests, sink,
+                args.concurrency, transport=transport, pipeline_depth=args.pipeline_depth,
+                max_streams=args.max_streams
+            ))
+        finally:
+            if writer:
+                writer.close()
+        rate = stats["requests"] / stats["elapsed"] if stats["elapsed"] else 0.0
+        print(f"{transport}: {stats['requests']} requests in {stats['elapsed']:.2f}s ({rate:.1f} req/s, {stats['http_version']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+
+# Per-server record of which tests of a run are done, so an interrupted
+# differential run can be resumed with --resume instead of starting over
+
+CHECKPOINT_FILE = "checkpoint.jsonl"
+# Completed tests between checkpoint writes (result stores save once per batch)
+SAVE_INTERVAL = 256
+
+
+def checkpoint_path(results_dir):
+    return os.path.join(results_dir, CHECKPOINT_FILE)
+
+
+def corpus_hash(file_paths):
+    """
+    SHA-256 over the test files in order, so a run is only resumed when it
+    is reading exactly the same corpus.
+    """
+    digest = hashlib.sha256()
+    for path in file_paths:
+        digest.update(os.path.basename(path).encode("utf-8") + b"\0")
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class Checkpoint:
+    """
+    Completed test IDs of one server's run plus the hash of the corpus
+    files, kept in <results_dir>/checkpoint.jsonl: a header line with the
+    hash, then one line per save listing the tests completed since the last.
+    Saves only append, and a line cut off by an interrupted write is
+    ignored when the checkpoint is loaded.
+    """
+
+    def __init__(self, results_dir, corpus_digest, completed=(), started=False):
+        self.path = checkpoint_path(results_dir)
+        self.corpus_digest = corpus_digest
+        self.completed = set(completed)
+        self.unsaved = []
+        # Whether the file already holds this checkpoint's header
+        self.started = started
+
+    @classmethod
+    def resume(cls, results_dir, corpus_digest):
+        """
+        Loads the checkpoint of an earlier run of the same corpus. Returns a
+        fresh Checkpoint when there is none; raises ValueError when it was
+        made for a different corpus.
+        """
+        try:
+            with open(checkpoint_path(results_dir), 'r', encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return cls(results_dir, corpus_digest)
+        if not lines or json.loads(lines[0])["corpus_hash"] != corpus_digest:
+            raise ValueError(f"{checkpoint_path(results_dir)} was made for a different corpus; run without --resume")
+
+        completed = set()
+        for line in lines[1:]:
+            try:
+                completed.update(json.loads(line))
+            except ValueError:
+                # Torn final line
+                break
+        return cls(results_dir, corpus_digest, completed, started=True)
+
+    def complete(self, outcomes):
+        for outcome in outcomes:
+            if outcome["test_case"] not in self.completed:
+                self.completed.add(outcome["test_case"])
+                self.unsaved.append(outcome["test_case"])
+        if len(self.unsaved) >= SAVE_INTERVAL:
+            self.save()
+
+    def wrap(self, sink):
+        # Sink that hands each outcome on to `sink`, then marks it completed
+        def write(outcome):
+            sink(outcome)
+            self.complete([outcome])
+        return write
+
+    def save(self):
+        if not self.started:
+            # Start a new file, replacing an earlier run's checkpoint
+            with open(self.path, 'w', encoding="utf-8") as f:
+                f.write(json.dumps({"corpus_hash": self.corpus_digest}) + "\n")
+                if self.completed:
+                    f.write(json.dumps(sorted(self.completed)) + "\n")
+            self.started = True
+        elif self.unsaved:
+            with open(self.path, 'a', encoding="utf-8") as f:
+                f.write(json.dumps(self.unsaved) + "\n")
+        self.unsaved = []
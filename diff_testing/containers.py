@@ -0,0 +1,215 @@
+import hashlib
+import http.client
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import docker
+
+# Build context for every server image (this directory)
+DIFF_TESTING = os.path.dirname(os.path.abspath(__file__))
+CONTAINER_PORT = 80
+CONTENT_HASH_LABEL = "diff_testing.content_hash"
+# Containers started in pool mode are left running and reused by later runs
+POOL_LABEL = "diff_testing.pool"
+
+# Define  server configurations
+SERVERS = [
+    {"name": "nginx", "dockerfile": "nginx.dockerfile", "port": 8080},
+    {"name": "apache", "dockerfile": "httpd.dockerfile", "port": 8081},
+    {"name": "caddy", "dockerfile": "caddy.dockerfile", "port": 8082},
+    {"name": "h2o", "dockerfile": "h2o.dockerfile", "port": 8083},
+    {"name": "lighttpd", "dockerfile": "lighttpd.dockerfile", "port": 8084}
+]
+
+# How long to wait for a container to start answering HTTP requests
+READY_TIMEOUT = 60
+READY_INTERVAL = 0.1
+
+
+# Source paths of every COPY/ADD instruction in a dockerfile
+def copied_paths(dockerfile_path):
+    sources = []
+    with open(os.path.join(DIFF_TESTING, dockerfile_path), 'r', encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if not parts or parts[0].upper() not in ("COPY", "ADD"):
+                continue
+            args = [arg for arg in parts[1:] if not arg.startswith("--")]
+            sources.extend(args[:-1])
+    return sources
+
+
+def content_hash(dockerfile_path):
+    """
+    Hashes a dockerfile together with every file it copies into the image
+    (e.g. Caddyfile, h2o.conf, model_fs). Images are tagged with this
+    hash, so an unchanged server is never rebuilt.
+    """
+    digest = hashlib.sha256()
+    with open(os.path.join(DIFF_TESTING, dockerfile_path), 'rb') as f:
+        digest.update(f.read())
+
+    for source in copied_paths(dockerfile_path):
+        root = os.path.join(DIFF_TESTING, source)
+        if os.path.isfile(root):
+            files = [root]
+        else:
+            files = sorted(
+                os.path.join(dirpath, filename)
+                for dirpath, dirnames, filenames in os.walk(root)
+                for filename in filenames
+            )
+        for path in files:
+            digest.update(os.path.relpath(path, DIFF_TESTING).encode("utf-8") + b"\0")
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+            digest.update(b"\0")
+
+    return digest.hexdigest()[:16]
+
+
+# Build docker image from dockerfile, unless one with the same content hash exists
+def build_image(dockerfile_path, tag, client=None):
+    client = client or docker.from_env()
+    digest = content_hash(dockerfile_path)
+    hashed_tag = f"{tag}:{digest}"
+
+    try:
+        image = client.images.get(hashed_tag)
+        print(f"Reusing image {hashed_tag}")
+        return image
+    except docker.errors.ImageNotFound:
+        pass
+
+    print(f"Building image {hashed_tag} from {dockerfile_path}")
+    image, logs = client.images.build(
+        path=DIFF_TESTING,
+        dockerfile=dockerfile_path,
+        tag=hashed_tag,
+        labels={CONTENT_HASH_LABEL: digest}
+    )
+    # for log in logs:
+    #     print(log.get('stream', '').strip())
+    image.tag(tag, "latest")
+    return image
+
+
+# Start each docker container
+def start_container(name, image, port, client, pool=False):
+    container = client.containers.run(
+        image.id,
+        name=name,
+        ports={f"{CONTAINER_PORT}/tcp": port},
+        labels={POOL_LABEL: str(port)} if pool else {},
+        detach=True
+    )
+    print(f"Started container {name} on port {port}")
+    return container
+
+
+def reattach_container(name, image, port, client):
+    """
+    Returns the pooled container called `name` if it is still running the
+    current image on the same port. A stale or stopped container with that
+    name is removed so a fresh one can take its place; returns None then.
+    """
+    try:
+        container = client.containers.get(name)
+    except docker.errors.NotFound:
+        return None
+
+    if (container.status == "running"
+            and container.image.id == image.id
+            and container.labels.get(POOL_LABEL) == str(port)):
+        print(f"Reattached to container {name} on port {port}")
+        return container
+
+    print(f"Replacing stale container {name}")
+    container.remove(force=True)
+    return None
+
+
+def wait_until_ready(port, timeout=READY_TIMEOUT, interval=READY_INTERVAL):
+    """
+    Polls localhost:port until the server answers an HTTP request (with
+    any status code), so the first test requests do not race startup.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        connection = http.client.HTTPConnection("localhost", port, timeout=1)
+        try:
+            connection.request("GET", "/")
+            connection.getresponse().read()
+            return
+        except (OSError, http.client.HTTPException):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Server on port {port} not ready after {timeout}s")
+            time.sleep(interval)
+        finally:
+            connection.close()
+
+
+# Build (or reuse) one server's image, start its container and wait for it.
+# Returns (container, whether this call started it rather than reattaching)
+def start_server(server, pool=False):
+    client = docker.from_env()
+    image = build_image(server["dockerfile"], server["name"], client)
+
+    container = None
+    if pool:
+        container = reattach_container(server["name"], image, server["port"], client)
+    started = container is None
+    if started:
+        container = start_container(server["name"], image, server["port"], client, pool)
+
+    try:
+        wait_until_ready(server["port"])
+    except TimeoutError:
+        # A reattached pool member is left for the pool's owner
+        if started:
+            stop_and_remove_containers([container])
+        raise
+    print(f"{server['name']} is ready")
+    return container, started
+
+
+# Start all docker containers, building images in parallel.
+# With pool=True, running containers from an earlier pooled run are reused
+# when their image is still current.
+def start_all_containers(servers=SERVERS, pool=False):
+    containers = []
+    started = []
+    with ThreadPoolExecutor(max_workers=len(servers)) as executor:
+        futures = [executor.submit(start_server, server, pool) for server in servers]
+        errors = []
+        for future in futures:
+            try:
+                container, new = future.result()
+            except Exception as e:
+                errors.append(e)
+                continue
+            containers.append(container)
+            if new:
+                started.append(container)
+
+    if errors:
+        # Do not leave the servers this call started running; reattached
+        # pool members stay up, as --pool promises
+        stop_and_remove_containers(started)
+        raise errors[0]
+
+    return containers
+
+
+# Stop and remove all docker containers
+def stop_and_remove_containers(containers):
+    for container in containers:
+        container.stop()
+        container.remove()
+        print(f"Stopped and removed container {container.name}")
+
+
+# Stop and remove every pooled container left running by earlier runs
+def remove_pool():
+    client = docker.from_env()
+    stop_and_remove_containers(client.containers.list(all=True, filters={"label": POOL_LABEL}))
@@ -0,0 +1,128 @@
+import hashlib
+import json
+
+
+def iter_file(file_path):
+    """
+    Yields the test cases in one test file. JSON files hold a single array
+    and are loaded whole; JSONL files (e.g. from walk.py --stream) are read
+    one line at a time so large generated corpora never sit in memory.
+    """
+    with open(file_path, 'r', encoding="utf-8") as file:
+        if file_path.endswith('.jsonl'):
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from json.load(file)
+
+
+# Yield the test cases from every test file, in order
+def iter_test_cases(file_paths):
+    for file_path in file_paths:
+        yield from iter_file(file_path)
+
+
+def iter_array_lines(text, name="<string>"):
+    """
+    Yields (line number, element) for each element of a JSON array, where
+    the line is the one the element starts on. Raises ValueError naming
+    `name` and the offset for anything that is not a complete array.
+    """
+    decoder = json.JSONDecoder()
+    whitespace = " \t\r\n"
+    pos = len(text) - len(text.lstrip(whitespace))
+    if text[pos:pos + 1] != "[":
+        raise ValueError(f"{name}: expected a JSON array at offset {pos}")
+    pos += 1
+    line, counted = 1, 0
+    while True:
+        while pos < len(text) and (text[pos] in whitespace or text[pos] == ","):
+            pos += 1
+        if pos == len(text):
+            raise ValueError(f"{name}: unterminated JSON array at offset {pos}")
+        if text[pos] == "]":
+            return
+        line += text.count("\n", counted, pos)
+        counted = pos
+        try:
+            element, pos = decoder.raw_decode(text, pos)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"{name}: {e.msg} at offset {e.pos}") from e
+        yield line, element
+
+
+# Yield (source, test case) from every test file, in order, where source is "path:line"
+def iter_sourced_test_cases(file_paths):
+    for file_path in file_paths:
+        with open(file_path, 'r', encoding="utf-8") as file:
+            if file_path.endswith('.jsonl'):
+                for line_number, line in enumerate(file, 1):
+                    if line.strip():
+                        yield f"{file_path}:{line_number}", json.loads(line)
+            else:
+                for line_number, test in iter_array_lines(file.read(), file_path):
+                    yield f"{file_path}:{line_number}", test
+
+
+def test_id(request):
+    """
+    Content-addressed ID of a test request: a BLAKE2b hash of its method,
+    exact request target and headers (names lowercased, sorted), i.e. of
+    what goes on the wire. The same request gets the same ID in every run
+    and from every test file, unlike its position in the corpus. The target
+    is not normalized, since its exact spelling is what is being tested.
+    Per-test data that is not sent, such as the base URI, is kept in the
+    sources map dedupe fills instead.
+    """
+    headers = sorted((name.lower(), value) for name, value in (request.get("headers") or {}).items())
+    canonical = json.dumps(["GET", request["path"], headers], ensure_ascii=False)
+    return hashlib.blake2b(canonical.encode("utf-8", errors="surrogatepass"), digest_size=8).hexdigest()
+
+
+# Build the GET request for each (source, relative path test) pair, keyed by its content-addressed ID
+def build_http1_requests(baseURL, uris):
+    for source, obj in uris:
+        # base_uri = obj["base_uri"].strip()
+        relative_uri = obj["relative_uri"].strip()
+        # full_uri = f"{base_uri}/{relative_uri}"  # Construct the full URL
+        full_uri = baseURL + '/' + relative_uri
+        request = {
+            "source": source,
+            "label": relative_uri,
+            "full_uri": full_uri,
+            "target": relative_uri,
+            # Request target for the raw transport, sent exactly as written
+            "path": "/" + relative_uri,
+            # What the model resolves: this reference against the test's base
+            "base_uri": obj["base_uri"].strip(),
+            "reference": relative_uri
+        }
+        request["test_case"] = test_id(request)
+        yield request
+
+
+def source_entry(request):
+    """
+    One occurrence of a test in the sources map: its "file:line" location,
+    and the base URI and reference the model resolves for it, since
+    occurrences of the same request can come with different bases.
+    """
+    return {"location": request["source"], "base_uri": request.get("base_uri"), "reference": request.get("reference")}
+
+
+def dedupe(requests, sources=None):
+    """
+    Yields the first request with each test_case ID, dropping the repeats.
+    If `sources` is a dict, it collects {test_case: [source_entry, ...]}
+    for every occurrence.
+    """
+    seen = set()
+    for request in requests:
+        test_case = request["test_case"]
+        if sources is not None:
+            sources.setdefault(test_case, []).append(source_entry(request))
+        if test_case in seen:
+            continue
+        seen.add(test_case)
+        yield request
@@ -0,0 +1,228 @@
+import argparse
+import ctypes
+import hashlib
+import heapq
+import json
+import os
+import subprocess
+from array import array
+from collections import Counter
+from bisect import bisect_right
+import corpus
+import uri_oracle
+
+# Coverage-guided corpus selection: every candidate test is resolved by a
+# build of uri_model.c instrumented with gcc's -fsanitize-coverage=trace-pc,
+# and a greedy set cover keeps the fewest tests that hit the same branches
+
+TRACE_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "coverage_trace.c")
+NM = os.environ.get("NM", "nm")
+# Unoptimized, so basic blocks follow the source's branches
+COVERAGE_CFLAGS = ["-O0", "-shared", "-fPIC", "-DURI_MODEL_LIBRARY", "-fsanitize-coverage=trace-pc"]
+
+# The model's resolution path; resolve_uri and merge_paths_from_base hold
+# the branches that pick between the others
+DEFAULT_FUNCTIONS = ["resolve_uri", "parse_uri", "merge_paths_from_base", "remove_dot_segments", "build_uri_string"]
+
+
+def build_trace_object(source=TRACE_SOURCE, build_dir=uri_oracle.BUILD_DIR):
+    # Compiles the (uninstrumented) coverage callback to an object file
+    with open(source, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:16]
+    obj = os.path.join(build_dir, f"coverage_trace-{digest}.o")
+    if not os.path.exists(obj):
+        os.makedirs(build_dir, exist_ok=True)
+        tmp = obj + f".{os.getpid()}.tmp"
+        subprocess.run([uri_oracle.CC, "-O2", "-fPIC", "-c", "-o", tmp, source], check=True)
+        os.replace(tmp, obj)
+    return obj
+
+
+def function_ranges(library):
+    """
+    Returns {name: (start, end)} for every function in the library's symbol
+    table (static ones included), as offsets from its load address.
+    """
+    output = subprocess.run(
+        [NM, "--defined-only", "--print-size", library], check=True, capture_output=True, text=True
+    ).stdout
+    ranges = {}
+    for line in output.splitlines():
+        fields = line.split()
+        if len(fields) == 4 and fields[2] in "tT":
+            start = int(fields[0], 16)
+            ranges[fields[3]] = (start, start + int(fields[1], 16))
+    return ranges
+
+
+def hit_bucket(count):
+    # Power-of-two bucket of how often an edge was taken: 1, 2, 3, 4-7, 8-15, 16-31, 32+
+    return count if count < 4 else min(count.bit_length() + 1, 7)
+
+
+class CoverageTracer:
+    """
+    Resolves references with the instrumented model and reports the
+    control-flow edges each one took inside `functions`. An edge is a
+    (from block, to block) pair, numbered in the order first seen. With
+    hit_counts=True an edge taken a different number of times (in
+    hit_bucket's buckets) counts as a different edge, so tests that run the
+    model's loops more often are kept too.
+    """
+
+    def __init__(self, functions=DEFAULT_FUNCTIONS, hit_counts=False):
+        self.hit_counts = hit_counts
+        library = uri_oracle.build_library(flags=COVERAGE_CFLAGS + [build_trace_object()])
+        self.lib = ctypes.CDLL(library)
+        self.lib.resolve_uri.argtypes = [ctypes.c_char_p, ctypes.c_char_p]
+        self.lib.resolve_uri.restype = ctypes.c_void_p
+        self.lib.free_many.argtypes = [ctypes.POINTER(ctypes.c_void_p), ctypes.c_size_t]
+        self.lib.free_many.restype = None
+        self.lib.coverage_reset.restype = None
+        self.lib.coverage_trace.argtypes = [ctypes.POINTER(ctypes.c_size_t)]
+        self.lib.coverage_trace.restype = ctypes.c_void_p
+        self.lib.coverage_dropped.restype = ctypes.c_size_t
+
+        ranges = function_ranges(library)
+        missing = [name for name in functions if name not in ranges]
+        if missing:
+            raise ValueError(f"Not in the model: {', '.join(missing)}")
+        # Load address, from an exported function's runtime and symbol table addresses
+        base = ctypes.cast(self.lib.resolve_uri, ctypes.c_void_p).value - ranges["resolve_uri"][0]
+        spans = sorted((base + ranges[name][0], base + ranges[name][1], name) for name in functions)
+        self.starts = [start for start, _, _ in spans]
+        self.spans = spans
+        self.edges = {}
+        # Function each numbered edge leads into
+        self.edge_functions = []
+        self.truncated = 0
+
+    def function_at(self, address):
+        i = bisect_right(self.starts, address) - 1
+        if i >= 0 and address < self.spans[i][1]:
+            return self.spans[i][2]
+        return None
+
+    def trace(self, base, ref):
+        # Returns the set of edge numbers resolving ref against base took
+        self.lib.coverage_reset()
+        result = ctypes.c_void_p(self.lib.resolve_uri(uri_oracle._encode(base), uri_oracle._encode(ref)))
+        length = ctypes.c_size_t()
+        pointer = self.lib.coverage_trace(ctypes.byref(length))
+        if self.lib.coverage_dropped():
+            self.truncated += 1
+        pairs = array('Q')
+        pairs.frombytes(ctypes.string_at(pointer, length.value * 2 * pairs.itemsize))
+        self.lib.free_many(ctypes.byref(result), 1)
+
+        covered = set()
+        taken = Counter(zip(pairs[0::2], pairs[1::2]))
+        for (source, target), count in taken.items():
+            edge = (source, target, hit_bucket(count) if self.hit_counts else 1)
+            number = self.edges.get(edge)
+            if number is None:
+                function = self.function_at(target)
+                if function is None:
+                    continue
+                number = self.edges[edge] = len(self.edge_functions)
+                self.edge_functions.append(function)
+            covered.add(number)
+        return covered
+
+
+def greedy_cover(coverage):
+    """
+    Returns the indices of a small subset of `coverage` (one set of edges
+    per test) with the same union, in order. Each step takes the test that
+    adds the most uncovered edges, the earliest on ties. Gains only shrink,
+    so a stale gain from the heap is re-checked lazily instead of
+    recomputing every test's gain each step.
+    """
+    heap = [(-len(edges), i) for i, edges in enumerate(coverage) if edges]
+    heapq.heapify(heap)
+    covered = set()
+    chosen = []
+    while heap:
+        _, i = heapq.heappop(heap)
+        gain = len(coverage[i] - covered)
+        if gain == 0:
+            continue
+        if heap and (-gain, i) > heap[0]:
+            heapq.heappush(heap, (-gain, i))
+            continue
+        chosen.append(i)
+        covered |= coverage[i]
+    return sorted(chosen)
+
+
+def select_test_cases(tests, tracer, stats=None):
+    """
+    Returns the tests of a greedy minimal subset that covers every edge the
+    whole list covers, in their original order. Tests without a
+    relative_uri are kept unchanged. If a `stats` dict is given, it is
+    filled with the number of tests seen and kept and the edges covered per
+    function.
+    """
+    tests = list(tests)
+    candidates = [i for i, test in enumerate(tests) if "relative_uri" in test]
+    coverage = [
+        tracer.trace(tests[i].get("base_uri", "").strip(), tests[i]["relative_uri"].strip()) for i in candidates
+    ]
+    chosen = {candidates[j] for j in greedy_cover(coverage)}
+    kept = [test for i, test in enumerate(tests) if i in chosen or "relative_uri" not in test]
+
+    if stats is not None:
+        edges_per_function = {}
+        for function in tracer.edge_functions:
+            edges_per_function[function] = edges_per_function.get(function, 0) + 1
+        stats.update(seen=len(tests), kept=len(kept), edges=len(tracer.edge_functions),
+                     functions=edges_per_function, truncated=tracer.truncated)
+    return kept
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep a minimal set of test cases covering the same uri_model.c branches.")
+    parser.add_argument(
+        '--test_files',
+        nargs='+',
+        required=True,
+        help="Test case files to select from, JSON arrays or JSONL"
+    )
+    parser.add_argument(
+        '--output_file',
+        required=True,
+        help="File to write the kept test cases to (JSONL if it ends in .jsonl)"
+    )
+    parser.add_argument(
+        '--functions',
+        nargs='+',
+        default=DEFAULT_FUNCTIONS,
+        help="uri_model.c functions whose branch coverage must be preserved"
+    )
+    parser.add_argument(
+        '--hit_counts',
+        action='store_true',
+        help="Also preserve how often each branch is taken (1, 2, 3, 4-7, ... times), keeping tests that loop more"
+    )
+    args = parser.parse_args()
+
+    stats = {}
+    kept = select_test_cases(corpus.iter_test_cases(args.test_files), CoverageTracer(args.functions, args.hit_counts), stats)
+    with open(args.output_file, 'w', encoding="utf-8") as output:
+        if args.output_file.endswith('.jsonl'):
+            for test in kept:
+                output.write(json.dumps(test) + "\n")
+        else:
+            json.dump(kept, output, indent=4)
+
+    reduction = 1 - stats["kept"] / stats["seen"] if stats["seen"] else 0.0
+    print(f"Kept {stats['kept']} of {stats['seen']} test cases covering {stats['edges']} edges "
+          f"({reduction:.1%} reduction)")
+    for function in args.functions:
+        print(f"  {function}: {stats['functions'].get(function, 0)} edges")
+    if stats["truncated"]:
+        print(f"  {stats['truncated']} tests had traces too long to record in full")
+
+
+if __name__ == "__main__":
+    main()
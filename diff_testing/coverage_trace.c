@@ -0,0 +1,47 @@
+/*
+ * Coverage callback for the instrumented build of uri_model.c used by
+ * coverage_select.py. It is compiled on its own, without
+ * -fsanitize-coverage, so it is not traced itself.
+ *
+ * gcc -fsanitize-coverage=trace-pc calls __sanitizer_cov_trace_pc at the
+ * start of every basic block; each call appends the (previous block, block)
+ * edge to a buffer that is read back and reset around every test.
+ */
+#include <stddef.h>
+#include <stdint.h>
+
+/* Edges kept per test; later ones are only counted */
+#define TRACE_CAPACITY (1 << 20)
+
+static uintptr_t trace[2 * TRACE_CAPACITY];
+static size_t trace_length;
+static size_t trace_dropped;
+static uintptr_t previous_block;
+
+void __sanitizer_cov_trace_pc(void) {
+    uintptr_t block = (uintptr_t)__builtin_return_address(0);
+    if (trace_length < TRACE_CAPACITY) {
+        trace[2 * trace_length] = previous_block;
+        trace[2 * trace_length + 1] = block;
+        trace_length++;
+    } else {
+        trace_dropped++;
+    }
+    previous_block = block;
+}
+
+void coverage_reset(void) {
+    trace_length = 0;
+    trace_dropped = 0;
+    previous_block = 0;
+}
+
+/* The edges traced since the last reset, as (from, to) address pairs */
+const uintptr_t *coverage_trace(size_t *length) {
+    *length = trace_length;
+    return trace;
+}
+
+size_t coverage_dropped(void) {
+    return trace_dropped;
+}
@@ -0,0 +1,174 @@
+import asyncio
+import ssl
+import time
+import urllib.parse
+from aioquic.asyncio.client import connect
+from aioquic.asyncio.protocol import QuicConnectionProtocol
+from aioquic.h3.connection import H3_ALPN, H3Connection
+from aioquic.h3.events import DataReceived, HeadersReceived
+from aioquic.quic.configuration import QuicConfiguration
+from aioquic.quic.events import ConnectionTerminated, StreamReset
+from outcomes import (BodyDigest, declared_charset, start_outcome, record_success, record_status_error, record_failure,
+                      record_timing, finish_outcome, normalized_uri)
+
+# Seconds to wait for the handshake and for each response
+READ_TIMEOUT = 5.0
+
+
+class H3Response:
+    __slots__ = ("status_code", "headers", "body", "first_byte")
+
+    def __init__(self):
+        self.first_byte = None
+        self.status_code = None
+        self.headers = {}
+        self.body = BodyDigest()
+
+
+class H3ClientProtocol(QuicConnectionProtocol):
+    """
+    QUIC connection carrying HTTP/3 requests. Each request gets its own
+    stream; the future for a stream resolves with its H3Response once the
+    server ends the stream.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.http = H3Connection(self._quic)
+        self.responses = {}
+        self.waiters = {}
+
+    async def get(self, authority, path, headers=None):
+        stream_id = self._quic.get_next_available_stream_id()
+        fields = [
+            (b":method", b"GET"),
+            (b":scheme", b"https"),
+            (b":authority", authority.encode("utf-8")),
+            # Sent as-is, like the raw transport's request target
+            (b":path", path.encode("utf-8", errors="surrogateescape")),
+        ]
+        fields.extend((name.lower().encode("utf-8"), value.encode("utf-8")) for name, value in (headers or {}).items())
+        self.responses[stream_id] = H3Response()
+        waiter = self.waiters[stream_id] = self._loop.create_future()
+        self.http.send_headers(stream_id, fields, end_stream=True)
+        self.transmit()
+        try:
+            return await asyncio.wait_for(waiter, READ_TIMEOUT)
+        finally:
+            self.responses.pop(stream_id, None)
+            self.waiters.pop(stream_id, None)
+
+    def quic_event_received(self, event):
+        if isinstance(event, ConnectionTerminated):
+            error = ConnectionError(f"Connection closed: {event.reason_phrase or event.error_code}")
+            for waiter in self.waiters.values():
+                if not waiter.done():
+                    waiter.set_exception(error)
+            return
+        if isinstance(event, StreamReset):
+            waiter = self.waiters.get(event.stream_id)
+            if waiter and not waiter.done():
+                waiter.set_exception(ConnectionError(f"Stream reset: {event.error_code}"))
+            return
+
+        for h3_event in self.http.handle_event(event):
+            response = self.responses.get(h3_event.stream_id)
+            if response is None:
+                continue
+            if isinstance(h3_event, HeadersReceived):
+                if response.first_byte is None:
+                    response.first_byte = time.perf_counter()
+                for name, value in h3_event.headers:
+                    if name == b":status":
+                        response.status_code = int(value)
+                    else:
+                        response.headers[name.decode("latin-1")] = value.decode("latin-1")
+            elif isinstance(h3_event, DataReceived):
+                response.body.update(h3_event.data)
+            if h3_event.stream_ended:
+                waiter = self.waiters[h3_event.stream_id]
+                if not waiter.done():
+                    waiter.set_result(response)
+
+
+def client_configuration(verify=False, ca_file=None):
+    # The stand-in server and test containers use self-signed certificates
+    configuration = QuicConfiguration(is_client=True, alpn_protocols=H3_ALPN, idle_timeout=READ_TIMEOUT * 2)
+    configuration.verify_mode = ssl.CERT_REQUIRED if verify or ca_file else ssl.CERT_NONE
+    if ca_file:
+        configuration.load_verify_locations(ca_file)
+    return configuration
+
+
+# `connect` is the handshake time, given to the first request on the connection
+async def fetch_outcome(client, authority, base_url, test, connect=None):
+    outcome, lines = start_outcome(test)
+    resolved_uri = normalized_uri(base_url, test["path"])
+    started = time.perf_counter()
+    first_byte = None
+    try:
+        response = await client.get(authority, test["path"], test.get("headers"))
+        first_byte = response.first_byte
+        outcome["http_version"] = "HTTP/3"
+        # Same split as httpx's raise_for_status on the other transports
+        if 200 <= response.status_code < 300:
+            record_success(outcome, lines, test, response.status_code, resolved_uri, response.body,
+                           declared_charset(response.headers), response.headers.get("content-type"))
+        else:
+            record_status_error(outcome, lines, test, response.status_code, resolved_uri)
+    except asyncio.TimeoutError:
+        record_failure(outcome, lines, test, "no response", "timed out")
+    except (OSError, ValueError) as e:
+        record_failure(outcome, lines, test, e)
+    record_timing(outcome, started, first_byte, time.perf_counter(), connect)
+    return finish_outcome(outcome, lines)
+
+
+async def send_requests(base_url, tests, sink, max_streams, verify=False, ca_file=None, controller=None):
+    """
+    Sends every test to one server over a single QUIC connection, with up
+    to `max_streams` requests in flight as concurrent HTTP/3 streams (or
+    fewer, as an aimd.AimdController allows).
+    Outcomes use the same schema as the other transports.
+    Returns a dict with the request count and elapsed wall time.
+    """
+    url = urllib.parse.urlsplit(base_url)
+    base_url = base_url.rstrip("/")
+    pending = iter(tests)
+    count = 0
+    handshake = []
+
+    async def worker(client):
+        nonlocal count
+        for test in pending:
+            connect_time = handshake.pop() if handshake else None
+            if controller:
+                sink(await controller.track(lambda: fetch_outcome(client, url.netloc, base_url, test, connect_time)))
+            else:
+                sink(await fetch_outcome(client, url.netloc, base_url, test, connect_time))
+            count += 1
+
+    start = time.monotonic()
+    try:
+        connect_started = time.perf_counter()
+        async with connect(
+            url.hostname,
+            url.port or 443,
+            configuration=client_configuration(verify, ca_file),
+            create_protocol=H3ClientProtocol,
+            wait_connected=True
+        ) as client:
+            handshake.append(time.perf_counter() - connect_started)
+            await asyncio.gather(*(worker(client) for _ in range(max_streams)))
+    except ConnectionError as e:
+        # No QUIC connection (e.g. the server does not speak HTTP/3):
+        # every remaining test fails the way a refused TCP connection would
+        error = e if str(e) else e.__class__.__name__
+        for test in pending:
+            outcome, lines = start_outcome(test)
+            record_failure(outcome, lines, test, error)
+            record_timing(outcome, time.perf_counter())
+            sink(finish_outcome(outcome, lines))
+            count += 1
+
+    return {"requests": count, "elapsed": time.monotonic() - start}
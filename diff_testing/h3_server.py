@@ -0,0 +1,138 @@
+import os
+import asyncio
+import argparse
+import datetime
+import mimetypes
+import urllib.parse
+from aioquic.asyncio import serve
+from aioquic.asyncio.protocol import QuicConnectionProtocol
+from aioquic.h3.connection import H3_ALPN, H3Connection
+from aioquic.h3.events import HeadersReceived
+from aioquic.quic.configuration import QuicConfiguration
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+import prune
+
+# Local stand-in for an HTTP/3 capable server: serves model_fs over HTTP/3
+# (QUIC, UDP) and plain HTTP/1.1 (TCP) on the same port number, so both
+# transports can be run and compared offline against one implementation.
+
+DEFAULT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_fs")
+DEFAULT_PORT = 8443
+SERVER_NAME = "h3-standin"
+
+
+def respond(root, target):
+    """
+    Static file handling shared by both protocols. Returns (status,
+    [(header, value)], body) for a request target.
+    """
+    path = urllib.parse.unquote(urllib.parse.urlsplit(target).path) or "/"
+    path = prune.remove_dot_segments(path)
+    local = os.path.join(root, path.lstrip("/"))
+
+    if os.path.isdir(local):
+        if not path.endswith("/"):
+            return 301, [("location", path + "/")], b""
+        # An HTML index, like the containers' autoindex pages
+        listing = "".join(f'<a href="{name}">{name}</a>\n' for name in sorted(os.listdir(local)))
+        return 200, [("content-type", "text/html; charset=utf-8")], f"<pre>\n{listing}</pre>\n".encode("utf-8")
+
+    if os.path.isfile(local):
+        with open(local, 'rb') as f:
+            body = f.read()
+        content_type = mimetypes.guess_type(local)[0] or "application/octet-stream"
+        return 200, [("content-type", content_type)], body
+
+    return 404, [("content-type", "text/plain")], b"Not Found\n"
+
+
+def self_signed_configuration(host):
+    # Fresh in-memory certificate; clients are expected not to verify it
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, host)])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=30))
+        .add_extension(x509.SubjectAlternativeName([x509.DNSName(host)]), critical=False)
+        .sign(key, hashes.SHA256())
+    )
+    configuration = QuicConfiguration(is_client=False, alpn_protocols=H3_ALPN)
+    configuration.certificate = certificate
+    configuration.private_key = key
+    return configuration
+
+
+class H3ServerProtocol(QuicConnectionProtocol):
+    root = DEFAULT_ROOT
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.http = H3Connection(self._quic)
+
+    def quic_event_received(self, event):
+        for h3_event in self.http.handle_event(event):
+            if not isinstance(h3_event, HeadersReceived):
+                continue
+            headers = dict(h3_event.headers)
+            target = headers.get(b":path", b"/").decode("utf-8", errors="surrogateescape")
+            status, response_headers, body = respond(self.root, target)
+            fields = [(b":status", str(status).encode()), (b"server", SERVER_NAME.encode()),
+                      (b"content-length", str(len(body)).encode())]
+            fields.extend((name.encode(), value.encode("utf-8", errors="surrogateescape"))
+                          for name, value in response_headers)
+            self.http.send_headers(h3_event.stream_id, fields, end_stream=not body)
+            if body:
+                self.http.send_data(h3_event.stream_id, body, end_stream=True)
+        self.transmit()
+
+
+async def handle_http1(root, reader, writer):
+    # Minimal keep-alive HTTP/1.1 server; requests are GETs without bodies
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            request_line = head.split(b"\r\n", 1)[0].decode("latin-1").split(" ")
+            if len(request_line) != 3:
+                writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                break
+            status, response_headers, body = respond(root, request_line[1])
+            lines = [f"HTTP/1.1 {status} {'OK' if status == 200 else 'Status'}", f"Server: {SERVER_NAME}",
+                     f"Content-Length: {len(body)}"]
+            lines.extend(f"{name}: {value}" for name, value in response_headers)
+            writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("utf-8", errors="surrogateescape") + body)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def run(host, port, root):
+    H3ServerProtocol.root = root
+    await serve(host, port, configuration=self_signed_configuration(host), create_protocol=H3ServerProtocol)
+    server = await asyncio.start_server(lambda r, w: handle_http1(root, r, w), host, port)
+    print(f"Serving {root} on {host}:{port} (HTTP/3 over UDP, HTTP/1.1 over TCP)")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local HTTP/3 + HTTP/1.1 stand-in server for offline testing.")
+    parser.add_argument('--host', default="localhost", help="Address to listen on")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="UDP (HTTP/3) and TCP (HTTP/1.1) port")
+    parser.add_argument('--root', default=DEFAULT_ROOT, help="Directory to serve")
+    args = parser.parse_args()
+    asyncio.run(run(args.host, args.port, args.root))
+
+
+if __name__ == "__main__":
+    main()
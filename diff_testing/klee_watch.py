@@ -0,0 +1,161 @@
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "test_cases"))
+import ktest
+import scrape
+import corpus
+import request_engine
+
+# Streams test cases out of a KLEE output directory while KLEE is still
+# writing it, so differential results arrive during symbolic exploration
+
+# Seconds between directory scans
+DEFAULT_POLL_INTERVAL = 0.5
+# KLEE writes this to its info file once exploration has finished
+DONE_MARKER = "KLEE: done:"
+
+
+def klee_test_id(c_string):
+    # The test_case ID a KLEE string's request gets; the builder strips the
+    # string, so strings differing only in surrounding whitespace share it
+    request = next(corpus.build_http1_requests("", [(None, scrape.klee_test_case(c_string))]))
+    return request["test_case"]
+
+
+def klee_finished(klee_output_dir):
+    try:
+        with open(os.path.join(klee_output_dir, "info"), 'r', encoding="utf-8", errors="replace") as f:
+            return DONE_MARKER in f.read()
+    except FileNotFoundError:
+        return False
+
+
+class KleeWatcher:
+    """
+    Polls a KLEE output directory for new .ktest files and puts each new
+    (source, test case) pair on a queue as soon as it decodes, in the format
+    scrape.py writes. A test whose request ID (klee_test_id) was already
+    seen is not queued again; `sources` maps every ID to all the .ktest
+    files that produced it. A file that fails to parse is retried on the next scan,
+    since KLEE may still be writing it.
+    None is queued once KLEE has finished and everything it wrote has
+    been read, or after `idle_timeout` seconds without a new test.
+    """
+
+    def __init__(self, klee_output_dir, poll_interval=DEFAULT_POLL_INTERVAL, idle_timeout=None):
+        self.klee_output_dir = klee_output_dir
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        self.sources = {}
+        self.read = set()
+        self.queued = 0
+        self.duplicates = 0
+
+    def scan(self, queue, final=False):
+        # Queue the tests of every .ktest file not read yet; returns how many were read
+        try:
+            names = sorted(name for name in os.listdir(self.klee_output_dir) if name.endswith('.ktest'))
+        except FileNotFoundError:
+            # KLEE creates the directory itself, possibly after we start
+            return 0
+        count = 0
+        for name in names:
+            if name in self.read:
+                continue
+            path = os.path.join(self.klee_output_dir, name)
+            try:
+                c_string = ktest.ktest_string(path)
+            except (OSError, ValueError) as e:
+                if final:
+                    print(f"Error extracting data from {path}: {e}")
+                    self.read.add(name)
+                continue
+            self.read.add(name)
+            count += 1
+            if not c_string:
+                continue
+            test_case = klee_test_id(c_string)
+            if test_case in self.sources:
+                self.sources[test_case].append(path)
+                self.duplicates += 1
+                continue
+            self.sources[test_case] = [path]
+            self.queued += 1
+            queue.put_nowait((path, scrape.klee_test_case(c_string)))
+        return count
+
+    async def run(self, queue):
+        last_new = time.monotonic()
+        try:
+            while True:
+                # Check before scanning, so nothing written before the marker is missed
+                finished = klee_finished(self.klee_output_dir)
+                if self.scan(queue, final=finished):
+                    last_new = time.monotonic()
+                if finished:
+                    return
+                if self.idle_timeout is not None and time.monotonic() - last_new > self.idle_timeout:
+                    print(f"No new tests in {self.idle_timeout}s, stopping the watch")
+                    return
+                await asyncio.sleep(self.poll_interval)
+        finally:
+            queue.put_nowait(None)
+
+
+async def next_wave(queue):
+    """
+    Waits for at least one queued test, then takes every test already
+    waiting. Returns None once the watcher has finished.
+    """
+    item = await queue.get()
+    if item is None:
+        return None
+    wave = [item]
+    while not queue.empty():
+        item = queue.get_nowait()
+        if item is None:
+            # Leave the end marker for the next call
+            queue.put_nowait(None)
+            break
+        wave.append(item)
+    return wave
+
+
+def merge_stats(totals, stats):
+    # Add one wave's per-server stats to the run's totals
+    for name, result in stats.items():
+        total = totals.setdefault(name, {"requests": 0, "elapsed": 0.0})
+        total["requests"] += result["requests"]
+        total["elapsed"] += result["elapsed"]
+        total.update((key, value) for key, value in result.items() if key not in ("requests", "elapsed"))
+
+
+async def watch_and_send(watcher, make_jobs, concurrency=request_engine.DEFAULT_CONCURRENCY, **options):
+    """
+    Runs `watcher` and sends its tests to every server while it is still
+    watching. Each time the sender is free it takes all the tests queued so
+    far as one wave; make_jobs(wave) turns a list of (source, test case)
+    pairs into the send_to_all_servers jobs for it. `options` are passed
+    on to send_to_all_servers.
+    Returns the per-server stats summed over all waves.
+    """
+    queue = asyncio.Queue()
+    watching = asyncio.create_task(watcher.run(queue))
+    totals = {}
+    try:
+        while True:
+            wave = await next_wave(queue)
+            if wave is None:
+                break
+            stats = await request_engine.send_to_all_servers(make_jobs(wave), concurrency, **options)
+            merge_stats(totals, stats)
+            print(f"Sent a wave of {len(wave)} tests ({watcher.queued} queued so far)")
+    except BaseException:
+        watching.cancel()
+        raise
+    # Raises anything that stopped the watcher
+    await watching
+    return totals
@@ -0,0 +1,146 @@
+import math
+import json
+import argparse
+from statistics import median
+from response_comparison import DEFAULT_SERVERS, server_folder
+from timing_report import load_timings, format_ms, check_stores
+
+# Flags test cases whose processing time is an outlier, either against the
+# same server's other tests or against the other servers on the same test.
+# Latencies are the median over repeated trial runs of the same corpus, and
+# outliers are found with robust z-scores (median and MAD) of log latency,
+# so a few slow requests cannot hide an anomaly by inflating the spread.
+
+# Robust z-score above which a latency is flagged
+DEFAULT_THRESHOLD = 3.5
+# Scales MAD (and, when MAD is 0, the mean absolute deviation) to a normal sigma
+MAD_SCALE = 1.4826
+MEAN_AD_SCALE = 1.2533
+
+
+def robust_z_scores(values):
+    """
+    (x - median) / (1.4826 * MAD) for each value. When more than half of
+    the values are identical MAD is 0, and the scaled mean absolute
+    deviation is used instead; if that is 0 too every score is 0.
+    """
+    center = median(values)
+    deviations = [abs(v - center) for v in values]
+    scale = MAD_SCALE * median(deviations)
+    if not scale:
+        scale = MEAN_AD_SCALE * sum(deviations) / len(deviations)
+    if not scale:
+        return [0.0] * len(values)
+    return [(v - center) / scale for v in values]
+
+
+def trial_latencies(trials, servers):
+    """
+    Returns ({server: {test_case: [total latency per trial]}}, {test_case: uri})
+    from each trial run's result stores.
+    """
+    latencies = {server: {} for server in servers}
+    uris = {}
+    for results_dir in trials:
+        for server in servers:
+            for test_case, uri, status_code, timing in load_timings(server_folder(server, results_dir)):
+                latencies[server].setdefault(test_case, []).append(timing["total"])
+                uris[test_case] = uri
+    return latencies, uris
+
+
+def find_anomalies(latencies, uris, threshold=DEFAULT_THRESHOLD, min_trials=1):
+    """
+    Scores every (server, test) by the median of its trial latencies:
+      - self_z: against the server's own latencies on every other test
+      - cross_z: the test's latency relative to the median of the other
+        servers on the same test, against that same ratio on the server's
+        other tests (so a server that is slower across the board is not
+        flagged everywhere)
+    Returns a record for each score at or above threshold, worst first.
+    """
+    medians = {
+        server: {test: median(values) for test, values in tests.items() if len(values) >= min_trials}
+        for server, tests in latencies.items()
+    }
+
+    scores = {}
+    for server, tests in medians.items():
+        test_ids = [test for test, value in tests.items() if value > 0]
+        if len(test_ids) < 2:
+            continue
+        for test, z in zip(test_ids, robust_z_scores([math.log(tests[test]) for test in test_ids])):
+            scores[(server, test)] = {"self_z": z}
+
+        # Log ratio to the other servers' median on the same test
+        ratios = {}
+        for test in test_ids:
+            others = [medians[other][test] for other in medians
+                      if other != server and medians[other].get(test, 0) > 0]
+            if others:
+                ratios[test] = math.log(tests[test]) - math.log(median(others))
+        if len(ratios) >= 2:
+            for test, z in zip(ratios, robust_z_scores(list(ratios.values()))):
+                scores[(server, test)]["cross_z"] = z
+
+    anomalies = []
+    for (server, test), score in scores.items():
+        reasons = [name for name in ("self_z", "cross_z") if score.get(name, 0) >= threshold]
+        if not reasons:
+            continue
+        trials = latencies[server][test]
+        anomalies.append({
+            "test_case": test,
+            "uri": uris[test],
+            "server": server,
+            "median": medians[server][test],
+            "trials": len(trials),
+            "min": min(trials),
+            "max": max(trials),
+            "self_z": score["self_z"],
+            "cross_z": score.get("cross_z"),
+            "flagged": [reason[:-2] for reason in reasons],
+            "others": {other: medians[other].get(test) for other in medians if other != server},
+        })
+
+    anomalies.sort(key=lambda a: max(a["self_z"], a["cross_z"] or 0), reverse=True)
+    return anomalies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flag test cases with outlier processing time across trial runs.")
+    parser.add_argument(
+        '--results_dirs',
+        nargs='+',
+        required=True,
+        help="Subdirectories of repeated runs of the same corpus, one per trial (e.g., trial_1 trial_2 trial_3)"
+    )
+    parser.add_argument(
+        '--servers',
+        nargs='+',
+        default=DEFAULT_SERVERS,
+        help="Server folders to analyze (default: nginx apache caddy lighttpd h2o); name@run reads that server from another results_dir"
+    )
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="Robust z-score to flag at")
+    parser.add_argument('--min_trials', type=int, default=1, help="Ignore tests timed in fewer trials than this")
+    parser.add_argument('--top', type=int, default=20, help="Number of anomalies to print")
+    parser.add_argument('--output_file', help="Write every anomaly as JSON")
+    args = parser.parse_args()
+    check_stores(parser, [server_folder(server, results_dir) for results_dir in args.results_dirs for server in args.servers])
+
+    latencies, uris = trial_latencies(args.results_dirs, args.servers)
+    anomalies = find_anomalies(latencies, uris, args.threshold, args.min_trials)
+
+    print(f"{len(anomalies)} latency anomalies over {len(args.results_dirs)} trial(s)")
+    for anomaly in anomalies[:args.top]:
+        cross = "-" if anomaly["cross_z"] is None else f"{anomaly['cross_z']:.1f}"
+        print(f"  {anomaly['server']:<10} test {anomaly['test_case']}: {format_ms(anomaly['median'])} "
+              f"(self z {anomaly['self_z']:.1f}, cross z {cross}) {anomaly['uri'][:80]}")
+
+    if args.output_file:
+        with open(args.output_file, 'w', encoding="utf-8") as f:
+            json.dump(anomalies, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import hashlib
+import httpx
+
+# Bytes of each response body kept for the log; the rest is only hashed
+BODY_PREFIX = 200
+
+
+class BodyDigest:
+    """
+    Incremental BLAKE2b digest of a response body, fed chunk by chunk as
+    it streams in. Only the length and the first BODY_PREFIX bytes are kept,
+    so memory per in-flight request stays bounded however large the body.
+    """
+    __slots__ = ("hash", "prefix", "length")
+
+    def __init__(self):
+        self.hash = hashlib.blake2b(digest_size=16)
+        self.prefix = bytearray()
+        self.length = 0
+
+    def update(self, chunk):
+        self.hash.update(chunk)
+        if len(self.prefix) < BODY_PREFIX:
+            self.prefix += chunk[:BODY_PREFIX - len(self.prefix)]
+        self.length += len(chunk)
+
+    def hexdigest(self):
+        return self.hash.hexdigest()
+
+    def text(self, encoding="utf-8"):
+        # Decode the prefix with the response's charset, like httpx's .text
+        try:
+            return self.prefix.decode(encoding or "utf-8", errors="replace")
+        except LookupError:
+            return self.prefix.decode("utf-8", errors="replace")
+
+
+# Charset declared in a lowercase-keyed header dict, which httpx would
+# decode the body with
+def declared_charset(headers):
+    content_type = headers.get("content-type", "")
+    for param in content_type.split(";")[1:]:
+        key, _, value = param.strip().partition("=")
+        if key.lower() == "charset" and value:
+            return value.strip('"')
+    return "utf-8"
+
+
+def normalized_uri(base_url, path):
+    """
+    The URL httpx reports as response.url for a request to base_url + path:
+    dot-segments removed and characters percent-encoded as httpx does, no
+    fragment. Transports that send the path exactly as written record this,
+    so resolved URIs compare equal across every transport.
+    """
+    try:
+        return str(httpx.URL(base_url + path).copy_with(fragment=None))
+    except httpx.InvalidURL:
+        # httpx cannot send it at all; keep the path as written
+        return base_url + path
+
+
+# Start the outcome record and log lines for one test.
+# The "log" field ends up holding the text the synchronous sender used to
+# write for this test case (plus a body digest line for successful
+# responses), so existing log parsing keeps working.
+def start_outcome(test):
+    outcome = {
+        "test_case": test["test_case"],
+        "uri": test["label"],
+        "status_code": None,
+        "resolved_uri": None,
+        "error": None,
+    }
+    lines = [f"Test case {test['test_case']}: {test['label']}\n"]
+    if "expected_uri" in test:
+        # Resolution from the uri_model.c oracle, recorded next to the server's
+        outcome["expected_uri"] = test["expected_uri"]
+        lines.append(f"Model resolved URI: {test['expected_uri']}\n")
+    return outcome, lines
+
+
+# Log the successful response content; `body` is its BodyDigest
+def record_success(outcome, lines, test, status_code, resolved_uri, body, encoding="utf-8", content_type=None):
+    full_uri = test["full_uri"]
+    outcome["status_code"] = status_code
+    outcome["resolved_uri"] = str(resolved_uri)
+    outcome["body_digest"] = body.hexdigest()
+    outcome["content_length"] = body.length
+    outcome["content_type"] = content_type
+    lines.append(f"Request to {full_uri} completed with status code: {status_code}\n")
+    lines.append(f"Resolved URI: {resolved_uri}\n")
+    lines.append(f"Body digest: {body.hexdigest()} ({body.length} bytes)\n")
+    if content_type:
+        lines.append(f"Content type: {content_type}\n")
+    # Limit dump to the first BODY_PREFIX bytes
+    lines.append(f"Response content from {full_uri}: {body.text(encoding)}\n\n")
+
+
+# HTTP error (e.g., 404, 500, etc.)
+def record_status_error(outcome, lines, test, status_code, resolved_uri):
+    outcome["status_code"] = status_code
+    lines.append(f"Request to {test['full_uri']} returned error: {status_code}\n")
+    lines.append(f"Resolved URL: {resolved_uri}\n\n")
+
+
+# Request that got no response; `message` is the log line's lead-in
+def record_failure(outcome, lines, test, error, message="failed"):
+    outcome["error"] = str(error)
+    lines.append(f"Request to {test['full_uri']} {message}: {str(error)}\n\n")
+
+
+def record_timing(outcome, started, first_byte=None, finished=None, connect=None):
+    """
+    Stores the request's latency breakdown in seconds, measured on the
+    monotonic time.perf_counter() clock: time spent opening a new connection
+    for it (None when one was reused), time to the first response byte and
+    total time. The raw `started` value lets a run's span be computed later.
+    """
+    outcome["timing"] = {
+        "started": started,
+        "connect": connect,
+        "ttfb": None if first_byte is None else first_byte - started,
+        "total": None if finished is None else finished - started,
+    }
+
+
+def finish_outcome(outcome, lines):
+    outcome["log"] = "".join(lines)
+    return outcome
@@ -0,0 +1,94 @@
+import json
+import os
+import sqlite3
+
+DEFAULT_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".parse_cache.sqlite")
+
+# Bump when the parsed result layout changes so stale entries are dropped
+CACHE_VERSION = 5
+
+
+class ParseCache:
+    """
+    Persistent SQLite cache for response_comparison.py.
+
+    `parsed` holds the parse results of each log file or result store,
+    keyed by path and only valid while the file's mtime and size are
+    unchanged. `runs` and `differences` remember, per compared run (results
+    dir + server list), which test indices each server had and the
+    divergence records last computed, so only affected tests are compared
+    again.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE):
+        self.db = sqlite3.connect(path)
+        if self.db.execute("PRAGMA user_version").fetchone()[0] != CACHE_VERSION:
+            self.db.executescript("""
+                DROP TABLE IF EXISTS parsed;
+                DROP TABLE IF EXISTS runs;
+                DROP TABLE IF EXISTS differences;
+            """)
+            self.db.execute(f"PRAGMA user_version = {CACHE_VERSION}")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS parsed (
+                path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, results TEXT
+            );
+            CREATE TABLE IF NOT EXISTS runs (
+                run TEXT, server TEXT, indices TEXT, PRIMARY KEY (run, server)
+            );
+            CREATE TABLE IF NOT EXISTS differences (
+                run TEXT, test_case TEXT, record TEXT, PRIMARY KEY (run, test_case)
+            );
+        """)
+
+    def get(self, path):
+        """
+        Returns the cached [(test_index, row)] results for path, or None
+        if the file is not cached or changed since it was parsed.
+        """
+        stat = os.stat(path)
+        row = self.db.execute(
+            "SELECT results FROM parsed WHERE path = ? AND mtime_ns = ? AND size = ?",
+            (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        ).fetchone()
+        if row is None:
+            return None
+        return [(test_idx, tuple(values)) for test_idx, values in json.loads(row[0])]
+
+    def put(self, path, results):
+        stat = os.stat(path)
+        self.db.execute(
+            "INSERT OR REPLACE INTO parsed VALUES (?, ?, ?, ?)",
+            (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, json.dumps(results))
+        )
+
+    def run_indices(self, run):
+        """
+        Returns {server: set of test indices} from the last comparison of
+        this run, or None if it was never compared.
+        """
+        rows = self.db.execute("SELECT server, indices FROM runs WHERE run = ?", (run,)).fetchall()
+        if not rows:
+            return None
+        return {server: set(json.loads(indices)) for server, indices in rows}
+
+    def run_differences(self, run):
+        # Returns {test_index: divergence record} from the last comparison of this run
+        rows = self.db.execute("SELECT test_case, record FROM differences WHERE run = ?", (run,))
+        return {json.loads(test_case): json.loads(record) for test_case, record in rows}
+
+    def save_run(self, run, indices, differences):
+        self.db.execute("DELETE FROM runs WHERE run = ?", (run,))
+        self.db.execute("DELETE FROM differences WHERE run = ?", (run,))
+        self.db.executemany(
+            "INSERT INTO runs VALUES (?, ?, ?)",
+            [(run, server, json.dumps(sorted(test_indices))) for server, test_indices in indices.items()]
+        )
+        self.db.executemany(
+            "INSERT INTO differences VALUES (?, ?, ?)",
+            [(run, json.dumps(record["test_case"]), json.dumps(record)) for record in differences]
+        )
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
@@ -0,0 +1,184 @@
+import json
+import argparse
+import urllib.parse
+import corpus
+
+
+def remove_dot_segments(path):
+    """
+    Removes "." and ".." segments from a path following RFC 3986,
+    Section 5.2.4 (the same algorithm remove_dot_segments in uri_model.c
+    implements). Returns the cleaned path.
+    """
+    output = []
+
+    while path:
+        # A. Remove a leading "../" or "./"
+        if path.startswith('../'):
+            path = path[3:]
+        elif path.startswith('./'):
+            path = path[2:]
+        # B. Replace a leading "/./" or "/." with "/"
+        elif path.startswith('/./'):
+            path = path[2:]
+        elif path == '/.':
+            path = '/'
+        # C. Replace a leading "/../" or "/.." with "/" and drop the last output segment
+        elif path.startswith('/../'):
+            path = path[3:]
+            if output:
+                output.pop()
+        elif path == '/..':
+            path = '/'
+            if output:
+                output.pop()
+        # D. A lone "." or ".." is removed
+        elif path in ('.', '..'):
+            path = ''
+        # E. Move the first segment (with its leading "/", if any) to the output
+        else:
+            end = path.find('/', 1 if path.startswith('/') else 0)
+            if end == -1:
+                end = len(path)
+            output.append(path[:end])
+            path = path[end:]
+
+    return ''.join(output)
+
+
+def merge_paths_from_base(base_path, ref_path, base_has_authority=True):
+    """
+    Merges a relative reference path into the base path following
+    RFC 3986, Section 5.2.3.
+    """
+    # If ref_path starts with '/', it replaces the base path entirely
+    if ref_path.startswith('/'):
+        return ref_path
+    # A base with an authority and an empty path behaves like "/"
+    if base_has_authority and not base_path:
+        return '/' + ref_path
+    # Otherwise drop the last segment of the base path and append ref_path
+    return base_path[:base_path.rfind('/') + 1] + ref_path
+
+
+def resolve_target(base_uri, relative_uri):
+    """
+    Resolves relative_uri against base_uri and returns the normalized
+    target as authority + path (+ "?" + query).
+    """
+    base = urllib.parse.urlsplit(base_uri)
+    ref = urllib.parse.urlsplit(relative_uri)
+
+    if ref.scheme or ref.netloc:
+        authority = ref.netloc
+        path = remove_dot_segments(ref.path)
+        query = ref.query
+    else:
+        authority = base.netloc
+        if ref.path:
+            path = remove_dot_segments(merge_paths_from_base(base.path, ref.path, bool(base.netloc)))
+            query = ref.query
+        else:
+            path = base.path
+            query = ref.query or base.query
+
+    target = authority + path
+    if query:
+        target += "?" + query
+    return target
+
+
+def structural_features(relative_uri):
+    """
+    Describes how a relative path exercises dot-segment handling:
+    (segment count, "." segments, ".." segments, whether ".." climbs above
+    the start of the path, trailing slash, ends in a dot-segment).
+    Tests with the same normalized target and the same features exercise
+    the same normalization logic.
+    """
+    segments = relative_uri.split('?', 1)[0].split('/')
+    depth = 0
+    climbs_above_root = False
+    for segment in segments:
+        if segment == '..':
+            if depth == 0:
+                climbs_above_root = True
+            else:
+                depth -= 1
+        elif segment not in ('.', ''):
+            depth += 1
+
+    return (
+        len(segments),
+        segments.count('.'),
+        segments.count('..'),
+        climbs_above_root,
+        relative_uri.endswith('/'),
+        segments[-1] in ('.', '..'),
+    )
+
+
+def prune_test_cases(tests, keep=1, stats=None):
+    """
+    Yields at most `keep` representatives from each equivalence class of
+    (normalized target, structural features). Tests without a
+    relative_uri are passed through unchanged. If a `stats` dict is given,
+    it is filled with the number of tests seen, kept and classes found.
+    """
+    if stats is None:
+        stats = {}
+    stats.update({"seen": 0, "kept": 0, "classes": 0})
+    class_counts = {}
+
+    for test in tests:
+        stats["seen"] += 1
+        if "relative_uri" in test:
+            relative_uri = test["relative_uri"].strip()
+            key = (resolve_target(test.get("base_uri", ""), relative_uri), structural_features(relative_uri))
+            count = class_counts.get(key, 0)
+            if count == 0:
+                stats["classes"] += 1
+            class_counts[key] = count + 1
+            if count >= keep:
+                continue
+        stats["kept"] += 1
+        yield test
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prune path test cases that normalize to the same target.")
+    parser.add_argument(
+        '--test_files',
+        nargs='+',
+        required=True,
+        help="Test case files to prune, JSON arrays or JSONL"
+    )
+    parser.add_argument(
+        '--output_file',
+        required=True,
+        help="File to write the kept test cases to (JSONL if it ends in .jsonl)"
+    )
+    parser.add_argument(
+        '--keep',
+        type=int,
+        default=1,
+        help="Number of representatives to keep per equivalence class"
+    )
+    args = parser.parse_args()
+
+    stats = {}
+    kept = prune_test_cases(corpus.iter_test_cases(args.test_files), args.keep, stats)
+    with open(args.output_file, 'w', encoding="utf-8") as output:
+        if args.output_file.endswith('.jsonl'):
+            for test in kept:
+                output.write(json.dumps(test) + "\n")
+        else:
+            json.dump(list(kept), output, indent=4)
+
+    reduction = 1 - stats["kept"] / stats["seen"] if stats["seen"] else 0.0
+    print(f"Kept {stats['kept']} of {stats['seen']} test cases "
+          f"({stats['classes']} equivalence classes, {reduction:.1%} reduction)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+import asyncio
+import time
+import urllib.parse
+from collections import deque
+from outcomes import (BodyDigest, declared_charset, start_outcome, record_success, record_status_error, record_failure,
+                      record_timing, finish_outcome, normalized_uri)
+
+# Requests written back-to-back on a connection before reading responses
+DEFAULT_PIPELINE_DEPTH = 8
+READ_TIMEOUT = 5.0
+READ_SIZE = 65536
+# Attempts a request gets when its connection fails without any progress
+MAX_ATTEMPTS = 3
+
+
+class RawResponse:
+    __slots__ = ("http_version", "status_code", "headers", "body", "keep_alive")
+
+    def __init__(self, http_version, status_code, headers, body, keep_alive):
+        self.http_version = http_version
+        self.status_code = status_code
+        self.headers = headers
+        # BodyDigest of the (de-chunked) body
+        self.body = body
+        self.keep_alive = keep_alive
+
+
+class ResponseParser:
+    """
+    Incremental HTTP/1.1 response parser over one reusable buffer per
+    connection. Bytes are fed in as they arrive and complete responses are
+    taken off the front; consumed bytes are only compacted away once they
+    make up half of the buffer.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.start = 0
+
+    def feed(self, data):
+        if self.start and self.start * 2 >= len(self.buffer):
+            del self.buffer[:self.start]
+            self.start = 0
+        self.buffer += data
+
+    def has_buffered(self):
+        # Whether bytes of a following response have already arrived
+        return len(self.buffer) > self.start
+
+    def next_response(self, eof=False):
+        """
+        Returns the next complete RawResponse, or None if more bytes are
+        needed. At eof, a response without framing ends with the buffer.
+        """
+        while True:
+            head_end = self.buffer.find(b"\r\n\r\n", self.start)
+            if head_end == -1:
+                return None
+
+            with memoryview(self.buffer) as view:
+                head = bytes(view[self.start:head_end]).decode("latin-1").split("\r\n")
+                status_line = head[0].split(" ", 2)
+                status_code = int(status_line[1])
+                headers = {}
+                for line in head[1:]:
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                body_start = head_end + 4
+                framing = self._body_end(view, body_start, status_code, headers, eof)
+                if framing is None:
+                    return None
+                end, chunks = framing
+                body = BodyDigest()
+                for chunk in chunks:
+                    body.update(chunk)
+                    chunk.release()
+
+            self.start = end
+            if 100 <= status_code < 200:
+                # Skip interim responses
+                continue
+
+            connection = headers.get("connection", "").lower()
+            keep_alive = status_line[0] == "HTTP/1.1" and connection != "close"
+            return RawResponse(status_line[0], status_code, headers, body, keep_alive)
+
+    # Returns (end offset, [memoryview body chunks]) or None if incomplete
+    def _body_end(self, view, body_start, status_code, headers, eof):
+        if 100 <= status_code < 200 or status_code in (204, 304):
+            return body_start, []
+
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            chunks = []
+            pos = body_start
+            while True:
+                line_end = self.buffer.find(b"\r\n", pos)
+                if line_end == -1:
+                    return None
+                size = int(bytes(view[pos:line_end]).split(b";")[0], 16)
+                pos = line_end + 2
+                if size == 0:
+                    # Skip (usually empty) trailers
+                    if bytes(view[pos:pos + 2]) == b"\r\n":
+                        return pos + 2, chunks
+                    trailer_end = self.buffer.find(b"\r\n\r\n", pos)
+                    if trailer_end == -1:
+                        return None
+                    return trailer_end + 4, chunks
+                if len(self.buffer) < pos + size + 2:
+                    return None
+                chunks.append(view[pos:pos + size])
+                pos += size + 2
+
+        if "content-length" in headers:
+            end = body_start + int(headers["content-length"])
+            if len(self.buffer) < end:
+                return None
+            return end, [view[body_start:end]]
+
+        # No framing: the body runs until the server closes the connection
+        if not eof:
+            return None
+        return len(self.buffer), [view[body_start:]]
+
+
+def serialize_request(test, host):
+    """
+    Builds the exact bytes of a GET request for test["path"], which is sent
+    as-is: no normalization of dot-segments or percent-encoding.
+    """
+    headers = dict(test.get("headers") or {})
+    host = headers.pop("Host", host)
+    lines = [f"GET {test['path']} HTTP/1.1", f"Host: {host}"]
+    lines.extend(f"{name}: {value}" for name, value in headers.items())
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("utf-8", errors="surrogateescape")
+
+
+# `timing` is the (started, first_byte, finished, connect) of record_timing
+def build_outcome(test, request, base_url, response, timing):
+    outcome, lines = start_outcome(test)
+    # Exact bytes written to the socket (latin-1 maps them back one-to-one)
+    outcome["request_bytes"] = request.decode("latin-1")
+    outcome["http_version"] = response.http_version
+    resolved_uri = normalized_uri(base_url, test["path"])
+    # Match httpx's raise_for_status: anything but 2xx is an error
+    if 200 <= response.status_code < 300:
+        record_success(outcome, lines, test, response.status_code, resolved_uri, response.body,
+                       declared_charset(response.headers), response.headers.get("content-type"))
+    else:
+        record_status_error(outcome, lines, test, response.status_code, resolved_uri)
+    record_timing(outcome, *timing)
+    return finish_outcome(outcome, lines)
+
+
+def failure_outcome(test, request, error, started):
+    outcome, lines = start_outcome(test)
+    outcome["request_bytes"] = request.decode("latin-1")
+    record_failure(outcome, lines, test, error)
+    record_timing(outcome, started, finished=time.perf_counter())
+    return finish_outcome(outcome, lines)
+
+
+async def send_requests(base_url, tests, sink, concurrency, pipeline_depth=DEFAULT_PIPELINE_DEPTH):
+    """
+    Sends every test to one server over `concurrency` keep-alive sockets,
+    writing up to `pipeline_depth` pre-serialized requests at a time on each
+    and matching the responses back in order. Requests left unanswered when
+    a server closes the connection are retried on a new one.
+    A pipelined request's timing starts when its batch is written, so its
+    time to first byte includes waiting behind the responses ahead of it.
+    Returns a dict with the request count and elapsed wall time.
+    """
+    url = urllib.parse.urlsplit(base_url)
+    host, port = url.hostname, url.port or 80
+    base_url = base_url.rstrip("/")
+
+    pending = iter(tests)
+    # [test, request bytes, attempts] for requests that must be sent again
+    retries = deque()
+    count = 0
+
+    def next_batch():
+        batch = []
+        while retries and len(batch) < pipeline_depth:
+            batch.append(retries.popleft())
+        for test in pending:
+            batch.append([test, serialize_request(test, url.netloc), 0])
+            if len(batch) >= pipeline_depth:
+                break
+        return batch
+
+    def requeue(entries, progressed, error, started):
+        nonlocal count
+        # Requests behind an answered one are retried for free; a batch that
+        # got nowhere costs every request an attempt
+        for entry in reversed(entries):
+            if not progressed:
+                entry[2] += 1
+            if entry[2] >= MAX_ATTEMPTS:
+                sink(failure_outcome(entry[0], entry[1], error, started))
+                count += 1
+            else:
+                retries.appendleft(entry)
+
+    async def connection_worker():
+        nonlocal count
+        reader = writer = None
+        parser = None
+        try:
+            while True:
+                batch = next_batch()
+                if not batch:
+                    return
+
+                answered = 0
+                started = time.perf_counter()
+                # Connection setup time, charged to the first request sent on it
+                connect = None
+                # When the first byte of the next response to match arrived
+                first_byte = None
+                last_read = started
+                try:
+                    if writer is None:
+                        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), READ_TIMEOUT)
+                        parser = ResponseParser()
+                        eof = False
+                        connect = time.perf_counter() - started
+
+                    writer.write(b"".join(entry[1] for entry in batch))
+                    await writer.drain()
+
+                    while answered < len(batch):
+                        response = parser.next_response(eof)
+                        if response is None:
+                            if eof:
+                                raise ConnectionError("Server closed the connection")
+                            data = await asyncio.wait_for(reader.read(READ_SIZE), READ_TIMEOUT)
+                            last_read = time.perf_counter()
+                            if data:
+                                parser.feed(data)
+                                if first_byte is None:
+                                    first_byte = last_read
+                            else:
+                                eof = True
+                            continue
+
+                        finished = time.perf_counter()
+                        test, request, _ = batch[answered]
+                        timing = (started, first_byte or finished, finished, connect if answered == 0 else None)
+                        sink(build_outcome(test, request, base_url, response, timing))
+                        count += 1
+                        answered += 1
+                        # Leftover bytes belong to the next response and arrived with the last read
+                        first_byte = last_read if parser.has_buffered() else None
+                        if not response.keep_alive and answered < len(batch):
+                            raise ConnectionError("Server closed the connection")
+
+                    if eof or not response.keep_alive:
+                        writer.close()
+                        writer = None
+
+                except (OSError, asyncio.TimeoutError, ValueError, IndexError) as e:
+                    if writer is not None:
+                        writer.close()
+                        writer = None
+                    error = e if str(e) else e.__class__.__name__
+                    requeue(batch[answered:], answered > 0, error, started)
+        finally:
+            if writer is not None:
+                writer.close()
+
+    start = time.monotonic()
+    await asyncio.gather(*(connection_worker() for _ in range(concurrency)))
+    return {"requests": count, "elapsed": time.monotonic() - start}
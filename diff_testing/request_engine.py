@@ -0,0 +1,220 @@
+import asyncio
+import time
+import httpx
+import aimd
+import raw_sender
+from outcomes import (BodyDigest, start_outcome, record_success, record_status_error, record_failure,
+                      record_timing, finish_outcome)
+
+# Default number of in-flight requests per server
+DEFAULT_CONCURRENCY = 16
+# Default number of concurrent streams on the single HTTP/2 or QUIC connection
+DEFAULT_MAX_STREAMS = 100
+
+
+# httpcore trace hook timing how long opening a new connection takes
+def connect_tracer(marks):
+    async def trace(event_name, info):
+        if event_name.startswith("connection."):
+            if event_name.endswith(".started"):
+                marks.setdefault("connect_started", time.perf_counter())
+            elif event_name.endswith(".complete"):
+                marks["connect_complete"] = time.perf_counter()
+    return trace
+
+
+# Send one test request through httpx and build its outcome record
+async def fetch_outcome(client, test):
+    outcome, lines = start_outcome(test)
+    marks = {}
+    started = time.perf_counter()
+
+    try:
+        # Send the GET request, hashing the body as it streams in
+        async with client.stream("GET", test["target"], headers=test.get("headers"),
+                                 extensions={"trace": connect_tracer(marks)}) as response:
+            # Headers are in once the stream opens
+            marks["first_byte"] = time.perf_counter()
+            body = BodyDigest()
+            async for chunk in response.aiter_bytes():
+                body.update(chunk)
+        resolved_uri = response.url
+        outcome["http_version"] = response.http_version
+
+        # Raises HTTPStatusError for 4xx/5xx responses
+        response.raise_for_status()
+
+        record_success(outcome, lines, test, response.status_code, resolved_uri, body, response.encoding,
+                       response.headers.get("content-type"))
+
+    except httpx.RequestError as e:
+        # General request error (e.g., connection issues)
+        record_failure(outcome, lines, test, e)
+
+    except httpx.TimeoutException as e:
+        # Timeout error (e.g., server took too long to respond)
+        record_failure(outcome, lines, test, e, "timed out")
+
+    except httpx.HTTPStatusError as e:
+        outcome["http_version"] = e.response.http_version
+        record_status_error(outcome, lines, test, e.response.status_code, e.response.url)
+
+    except httpx.TooManyRedirects as e:
+        # Too many redirects error
+        record_failure(outcome, lines, test, e, "failed due to too many redirects")
+
+    except Exception as e:
+        # Catch any other unexpected errors
+        outcome["error"] = str(e)
+        lines.append(f"An unexpected error occurred with {test['full_uri']}: {str(e)}\n\n")
+
+    connect = None
+    if "connect_complete" in marks:
+        connect = marks["connect_complete"] - marks["connect_started"]
+    record_timing(outcome, started, marks.get("first_byte"), time.perf_counter(), connect)
+    return finish_outcome(outcome, lines)
+
+
+# Sink that writes each outcome to its own {i}.json log file
+def log_file_sink(base_log_file):
+    def write(outcome):
+        with open(base_log_file + f"{outcome['test_case']}.json", 'w', encoding="utf-8") as log:
+            log.write(outcome["log"])
+    return write
+
+
+# Ways of putting test requests on the wire
+TRANSPORTS = ["httpx", "raw", "http2", "http3"]
+# The ones the test containers can answer: they publish only TCP port 80,
+# with no TLS or QUIC, so http3 is for servers like h3_server.py
+CONTAINER_TRANSPORTS = ["httpx", "raw", "http2"]
+
+
+async def supports_h2c(base_url):
+    """
+    Returns True if the server at base_url answers HTTP/2 with prior
+    knowledge over plaintext (h2c). Servers that only speak HTTP/1.1
+    reject the connection preface, which shows up as a protocol error.
+    """
+    try:
+        async with httpx.AsyncClient(base_url=base_url, http1=False, http2=True) as client:
+            response = await client.get("/")
+    except httpx.HTTPError:
+        return False
+    return response.http_version == "HTTP/2"
+
+
+# Send every test through `client` from `workers` coroutines, within the
+# AimdController's window when one is given
+async def run_workers(client, tests, sink, workers, controller=None):
+    # Workers pull from one shared iterator, so tests are only read as needed
+    pending = iter(tests)
+    count = 0
+
+    async def worker():
+        nonlocal count
+        for test in pending:
+            if controller:
+                sink(await controller.track(lambda: fetch_outcome(client, test)))
+            else:
+                sink(await fetch_outcome(client, test))
+            count += 1
+
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    return count
+
+
+async def send_requests(base_url, tests, sink, concurrency=DEFAULT_CONCURRENCY, transport="httpx",
+                        pipeline_depth=raw_sender.DEFAULT_PIPELINE_DEPTH, max_streams=DEFAULT_MAX_STREAMS,
+                        controller=None):
+    """
+    Sends every test in `tests` to one server, keeping up to `concurrency`
+    requests in flight over a shared pool of keep-alive connections.
+    Each outcome is handed to `sink` as soon as it completes.
+    With transport="raw", requests go out byte-for-byte over pipelined
+    sockets instead (see raw_sender.py). With transport="http2", they are
+    multiplexed as up to `max_streams` concurrent streams over a single h2c
+    connection, falling back to HTTP/1.1 if the server does not support it.
+    With transport="http3", they go out as `max_streams` concurrent streams
+    over one QUIC connection to the same host and port (see h3_sender.py).
+    An aimd.AimdController adapts how many of those requests or streams are
+    actually in flight (not used by the raw transport).
+    Returns a dict with the request count, elapsed wall time and the HTTP
+    version used.
+    """
+    if transport == "raw":
+        stats = await raw_sender.send_requests(base_url, tests, sink, concurrency, pipeline_depth)
+        stats["http_version"] = "HTTP/1.1"
+        return stats
+    if transport == "http3":
+        # aioquic is only needed for this transport
+        import h3_sender
+        stats = await h3_sender.send_requests(base_url, tests, sink, max_streams, controller=controller)
+        stats["http_version"] = "HTTP/3"
+        return stats
+
+    start = time.monotonic()
+    if transport == "http2" and await supports_h2c(base_url):
+        # One connection; the server's SETTINGS_MAX_CONCURRENT_STREAMS still applies
+        limits = httpx.Limits(max_connections=1, max_keepalive_connections=1)
+        async with httpx.AsyncClient(base_url=base_url, http1=False, http2=True, limits=limits) as client:
+            count = await run_workers(client, tests, sink, max_streams, controller)
+        return {"requests": count, "elapsed": time.monotonic() - start, "http_version": "HTTP/2"}
+
+    if transport == "http2":
+        print(f"{base_url} does not support h2c, falling back to HTTP/1.1")
+        if controller:
+            controller.set_max_window(concurrency)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, http1=True, limits=limits) as client:
+        count = await run_workers(client, tests, sink, concurrency, controller)
+
+    return {"requests": count, "elapsed": time.monotonic() - start, "http_version": "HTTP/1.1"}
+
+
+async def send_to_all_servers(jobs, concurrency=DEFAULT_CONCURRENCY, adaptive=False, **options):
+    """
+    Runs one send_requests job per server concurrently on the same event loop.
+    `jobs` maps a server name to a (base_url, tests, sink) tuple; `options`
+    are passed on to send_requests.
+    With adaptive=True each server gets its own AimdController, capped at
+    `concurrency` (or max_streams for http2/http3), and a progress line with
+    every server's window is printed periodically.
+    Returns the per-server stats in the same order.
+    """
+    names = list(jobs)
+    controllers = {}
+    if adaptive:
+        multiplexed = options.get("transport") in ("http2", "http3")
+        cap = options.get("max_streams", DEFAULT_MAX_STREAMS) if multiplexed else concurrency
+        controllers = {name: aimd.AimdController(cap) for name in names}
+        progress = asyncio.create_task(aimd.report_progress(controllers))
+
+    try:
+        results = await asyncio.gather(
+            *(send_requests(*jobs[name], concurrency=concurrency, controller=controllers.get(name), **options)
+              for name in names)
+        )
+    finally:
+        if adaptive:
+            progress.cancel()
+
+    for name, controller in controllers.items():
+        results[names.index(name)].update(window=controller.window, decreases=controller.decreases)
+    return dict(zip(names, results))
+
+
+# Print requests/second for each server and for the whole run
+def print_throughput_summary(stats, elapsed):
+    print("Throughput summary:")
+    total = 0
+    for name, result in stats.items():
+        rate = result["requests"] / result["elapsed"] if result["elapsed"] else 0.0
+        line = f"  {name}: {result['requests']} requests in {result['elapsed']:.2f}s ({rate:.1f} req/s, {result['http_version']}"
+        if "window" in result:
+            line += f", final window {result['window']:.1f} after {result['decreases']} backoffs"
+        print(line + ")")
+        total += result["requests"]
+    rate = total / elapsed if elapsed else 0.0
+    print(f"  total: {total} requests in {elapsed:.2f}s ({rate:.1f} req/s)")
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import sqlite3
+from urllib.parse import urlsplit
+
+import outcomes
+import raw_sender
+
+DEFAULT_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".response_cache.sqlite")
+# Total size of the cached responses before least recently used ones are evicted
+DEFAULT_MAX_BYTES = 1 << 30
+
+# Bump when the cached response layout changes so stale entries are dropped
+CACHE_VERSION = 1
+# New responses between commits, so an interrupted run keeps what it fetched
+COMMIT_INTERVAL = 256
+# Entries deleted per eviction query
+EVICT_BATCH = 256
+
+# Outcome fields that come from the test rather than the server's response
+TEST_FIELDS = ("test_case", "uri", "expected_uri", "timing", "log")
+
+
+def cache_key(image, transport, request_bytes, full_uri):
+    """
+    Key of one response: the server image it came from, the transport it
+    was sent over and the exact request bytes. The test's full URI is
+    included too, since the logged response text names it.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (image, transport, full_uri):
+        digest.update(part.encode("utf-8", errors="surrogatepass") + b"\0")
+    digest.update(request_bytes)
+    return digest.digest()
+
+
+class ResponseCache:
+    """
+    Persistent SQLite cache of server responses for the differential test
+    scripts, keyed by cache_key. Once the cached responses exceed `max_bytes`
+    the least recently used are evicted. Each entry's `used` is a counter
+    that is bumped whenever it is read or written.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.db = sqlite3.connect(path)
+        if self.db.execute("PRAGMA user_version").fetchone()[0] != CACHE_VERSION:
+            self.db.execute("DROP TABLE IF EXISTS responses")
+            self.db.execute(f"PRAGMA user_version = {CACHE_VERSION}")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key BLOB PRIMARY KEY, response TEXT, size INTEGER, used INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS responses_used ON responses (used);
+        """)
+        size, used = self.db.execute("SELECT SUM(size), MAX(used) FROM responses").fetchone()
+        self.size = size or 0
+        self.clock = used or 0
+        self.uncommitted = 0
+
+    def get(self, key):
+        # Returns the cached response for key, or None
+        row = self.db.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self.clock += 1
+        self.db.execute("UPDATE responses SET used = ? WHERE key = ?", (self.clock, key))
+        return json.loads(row[0])
+
+    def put(self, key, response):
+        text = json.dumps(response)
+        old = self.db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        self.clock += 1
+        self.db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)", (key, text, len(text), self.clock))
+        self.size += len(text) - (old[0] if old else 0)
+        if self.size > self.max_bytes:
+            self.evict()
+
+        self.uncommitted += 1
+        if self.uncommitted >= COMMIT_INTERVAL:
+            self.db.commit()
+            self.uncommitted = 0
+
+    def evict(self):
+        # Drop least recently used entries until the cache fits in max_bytes
+        while self.size > self.max_bytes:
+            rows = self.db.execute(
+                "SELECT key, size FROM responses ORDER BY used LIMIT ?", (EVICT_BATCH,)
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.size -= size
+                if self.size <= self.max_bytes:
+                    break
+
+    def server(self, image, transport, base_url):
+        # Cache view for one server's run; see ServerCache
+        return ServerCache(self, image, transport, urlsplit(base_url).netloc)
+
+    def close(self):
+        # Also shrinks a cache opened with a lower max_bytes than it was filled with
+        self.evict()
+        self.db.commit()
+        self.db.close()
+
+
+class ServerCache:
+    """
+    One server's use of a ResponseCache during a run, counting its hits and
+    misses. Requests are keyed by the bytes raw_sender would send for them,
+    whichever transport is used; the transport is part of the key.
+    """
+
+    def __init__(self, cache, image, transport, host):
+        self.cache = cache
+        self.image = image
+        self.transport = transport
+        self.host = host
+        self.hits = 0
+        self.misses = 0
+        # test_case -> (key, test) of each miss sent to the server
+        self.pending = {}
+
+    def key(self, test):
+        return cache_key(self.image, self.transport, raw_sender.serialize_request(test, self.host), test["full_uri"])
+
+    def filter(self, tests, sink):
+        """
+        Hands the outcome of every cached test straight to `sink` and
+        yields the rest, which still have to be sent.
+        """
+        for test in tests:
+            key = self.key(test)
+            response = self.cache.get(key)
+            if response is not None:
+                self.hits += 1
+                sink(cached_outcome(test, response))
+                continue
+            self.misses += 1
+            self.pending[test["test_case"]] = (key, test)
+            yield test
+
+    def wrap(self, sink):
+        # Sink that hands each outcome on to `sink`, then caches its response
+        def write(outcome):
+            sink(outcome)
+            key, test = self.pending.pop(outcome["test_case"], (None, None))
+            # Requests that got no response may well succeed next time
+            if key is not None and outcome["error"] is None:
+                self.cache.put(key, response_fields(outcome, test))
+        return write
+
+
+def response_fields(outcome, test):
+    """
+    The part of an outcome that came from the server: every field but
+    TEST_FIELDS, plus the log lines after the test's own header lines.
+    """
+    response = {name: value for name, value in outcome.items() if name not in TEST_FIELDS}
+    _, header = outcomes.start_outcome(test)
+    response["log"] = outcome["log"][len("".join(header)):]
+    return response
+
+
+# Rebuild the outcome of `test` around a cached response
+def cached_outcome(test, response):
+    outcome, lines = outcomes.start_outcome(test)
+    fields = dict(response)
+    lines.append(fields.pop("log"))
+    outcome.update(fields)
+    outcome["cached"] = True
+    return outcomes.finish_outcome(outcome, lines)
+
+
+# Print each server's cache hits and misses for the run
+def print_cache_summary(server_caches):
+    print("Response cache summary:")
+    for name, server_cache in server_caches.items():
+        total = server_cache.hits + server_cache.misses
+        rate = 100.0 * server_cache.hits / total if total else 0.0
+        print(f"  {name}: {server_cache.hits} hits, {server_cache.misses} misses ({rate:.1f}% hit rate)")
@@ -4,103 +4,337 @@ import os
 import urllib.parse
 import json
 import argparse
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import parse_cache
+import result_store
+
+# Compact per-test result shared by log files and result stores
+ParsedResult = namedtuple(
+    'ParsedResult',
+    ['test_case', 'status_code', 'resolved_uri', 'body_digest', 'expected_uri'],
+    defaults=[None, None]
+)
+
+# One pass over each line: test case header, status code (success or
+# error), resolved URI, body digest, content type and the oracle's
+# resolution are alternatives of a single precompiled pattern
+LOG_LINE = re.compile(
+    r'^(?:Test case\s+([0-9a-f]+):'
+    r'|Request to .* (?:status code|returned error):\s+(\d+)'
+    r'|Resolved URI:\s+(.*)$'
+    r'|Body digest:\s+([0-9a-f]+)'
+    r'|Content type:\s+(.*)$'
+    r'|Model resolved URI:\s+(.*)$)'
+)
+
+# Bodies of these media types are not compared: each server renders its
+# own HTML directory listing, and model_fs serves no HTML files
+UNCOMPARED_MEDIA_TYPES = {"text/html"}
+
+# {test_case}.json, where test_case is a content-addressed ID (or, in runs
+# from before IDs, the test's position in the corpus)
+LOG_FILE_NAME = re.compile(r'^([0-9a-f]+)\.json$')
+
+# Log files handed to each worker process at a time
+PARSE_CHUNK_SIZE = 512
+
 
 def parse_log_file(log_path):
     """
     Parses a log file (e.g., 'nginx/run_1/0.json') and extracts:
-      - test_case index
+      - test_case ID
       - status_code (None if an error/exception occurred)
       - resolved_uri (only if status_code is successful instead of 404, 500, etc.)
-    Returns a dict with those fields.
+      - body_digest (successful responses, in logs that record one, except
+        directory listings and other UNCOMPARED_MEDIA_TYPES)
+      - expected_uri (the uri_model.c resolution, in --oracle runs)
+    Returns a ParsedResult tuple with those fields.
     """
-    data = {
-        'test_case': None,
-        'status_code': None,
-        'resolved_uri': None
-    }
+    test_case = None
+    status_code = None
+    resolved_uri = None
+    body_digest = None
+    expected_uri = None
+    content_type = None
 
     with open(log_path, 'r', encoding='utf-8') as f:
         for line in f:
-            # Get test case
-            match_test_case = re.match(r'^Test case\s+(\d+):', line.strip())
-            if match_test_case:
-                data['test_case'] = int(match_test_case.group(1))
+            match = LOG_LINE.match(line.strip())
+            if not match:
                 continue
+            case, code, resolved, digest, media_type, expected = match.groups()
+            if case is not None:
+                test_case = case
+            elif code is not None:
+                # Success and error lines both carry the status code
+                status_code = int(code)
+            elif digest is not None:
+                body_digest = digest
+            elif media_type is not None:
+                content_type = media_type
+            elif expected is not None:
+                # "None" when the model returned no resolution
+                if expected != "None":
+                    expected_uri = path_and_query(expected)
+            # Resolved URI, e.g. http://localhost:8080/abc.txt, host number is different for each implementation
+            # Only store resolved path if status_code < 400
+            elif status_code and status_code < 400:
+                resolved_uri = path_and_query(resolved)
 
-            # Match success
-            match_success = re.match(r'^Request to .* status code:\s+(\d+)', line.strip())
-            if match_success:
-                data['status_code'] = int(match_success.group(1))
-                continue
+    if not body_compared(content_type):
+        body_digest = None
+    return ParsedResult(test_case, status_code, resolved_uri, body_digest, expected_uri)
 
-            # Match error
-            match_error = re.match(r'^Request to .* returned error:\s+(\d+)', line.strip())
-            if match_error:
-                # If there's an error status code, store it, but no resolved_uri
-                data['status_code'] = int(match_error.group(1))
-                continue
 
-            # Resolved URI, e.g. http://localhost:8080/abc.txt, host number is different for each implementation
-            match_resolved = re.match(r'^Resolved URI:\s+(.*)$', line.strip())
-            if match_resolved:
-                # Only store resolved path if status_code < 400
-                if data['status_code'] and data['status_code'] < 400:
-                    full_uri = match_resolved.group(1)
-                    parsed = urllib.parse.urlparse(full_uri)
-                    # Combine path + query
-                    combined = parsed.path
-                    if parsed.query:
-                        combined += "?" + parsed.query
-                    data['resolved_uri'] = combined
-                else:
-                    pass
+def path_and_query(full_uri):
+    """
+    Strips the scheme and host (which differ per implementation) from a
+    resolved URI, keeping only path + query.
+    """
+    parsed = urllib.parse.urlparse(full_uri)
+    # Combine path + query
+    combined = parsed.path
+    if parsed.query:
+        combined += "?" + parsed.query
+    return combined
+
+
+def body_compared(content_type):
+    # Whether a response's body digest takes part in the comparison
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    return media_type not in UNCOMPARED_MEDIA_TYPES
+
+
+def parse_store_record(record):
+    """
+    Converts an outcome record from a result store into the same
+    ParsedResult parse_log_file returns for a log file.
+    """
+    status_code = record['status_code']
+    resolved_uri = None
+    # Only store resolved path if status_code < 400
+    if status_code and status_code < 400 and record['resolved_uri']:
+        resolved_uri = path_and_query(record['resolved_uri'])
+    expected_uri = path_and_query(record['expected_uri']) if record.get('expected_uri') else None
+    body_digest = record.get('body_digest') if body_compared(record.get('content_type')) else None
+    return ParsedResult(str(record['test_case']), status_code, resolved_uri, body_digest, expected_uri)
+
+
+def parse_store(folder):
+    # Returns [(test_index, parsed_data)] for a server's result store
+    return [(str(record['test_case']), parse_store_record(record)) for record in result_store.ResultReader(folder)]
+
 
-    return data
+def parse_log_chunk(paths):
+    # Returns [(test_index, parsed_data)] for a chunk of (test_index, log path) pairs
+    return [(test_idx, parse_log_file(path)) for test_idx, path in paths]
 
 
-def compare_logs_in_subfolders(output_file, subfolder):
+def list_log_files(folder):
     """
-    1. We look for JSON files named '0.json', '1.json', etc.
-       in the subfolders for each server.
-    2. We parse each file (using parse_log_file).
-    3. We compare the status_code and resolved_uri across servers
-       for each test index.
+    Returns [(test_index, path)] for the per-test log files in a folder.
+    """
+    log_files = []
+    pattern = os.path.join(folder, '*.json') 
+    for path in glob.glob(pattern): # e.g. glob("./nginx/run_1/*.json") -> ["./nginx/run_1/0.json", "./nginx/run_1/1.json", ...]
+        filename = os.path.basename(path)  # e.g. "0.json"
+        # parse out the test # from "0.json" => 0
+        match = LOG_FILE_NAME.match(filename)
+        if match:
+            log_files.append((match.group(1), path))
+    return log_files
+
+
+def load_all_results(server_dirs, workers=None, cache=None):
+    """
+    Parses every server's results in a process pool: one task per result
+    store, or one task per chunk of PARSE_CHUNK_SIZE log files. Files whose
+    results are in `cache` (a ParseCache) and unchanged are not reparsed.
+    Returns ({server: {test_index: parsed_data}},
+             {server: set of test indices that were parsed again}).
+    """
+    all_results = {server: {} for server in server_dirs}
+    changed = {server: set() for server in server_dirs}
+
+    # (server, parse function, argument, files it covers) for each cache miss
+    tasks = []
+    for server, folder in server_dirs.items():
+        if result_store.has_store(folder):
+            path = result_store.store_path(folder)
+            cached = cache.get(path) if cache else None
+            if cached is None:
+                tasks.append((server, parse_store, folder, [path]))
+            else:
+                all_results[server].update((idx, ParsedResult(*row)) for idx, row in cached)
+            continue
+
+        misses = []
+        for test_idx, path in list_log_files(folder):
+            cached = cache.get(path) if cache else None
+            if cached is None:
+                misses.append((test_idx, path))
+            else:
+                all_results[server].update((idx, ParsedResult(*row)) for idx, row in cached)
+        for start in range(0, len(misses), PARSE_CHUNK_SIZE):
+            chunk = misses[start:start + PARSE_CHUNK_SIZE]
+            tasks.append((server, parse_log_chunk, chunk, [path for _, path in chunk]))
+
+    if (workers or os.cpu_count() or 1) <= 1:
+        # A pool only adds pickling overhead on a single core
+        parsed_tasks = [function(argument) for _, function, argument, _ in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(function, argument) for _, function, argument, _ in tasks]
+            parsed_tasks = [future.result() for future in futures]
+
+    for (server, function, _, paths), parsed in zip(tasks, parsed_tasks):
+        all_results[server].update(parsed)
+        changed[server].update(idx for idx, _ in parsed)
+        if cache:
+            if function is parse_store:
+                cache.put(paths[0], parsed)
+            else:
+                # One log file per parsed result, in chunk order
+                for path, item in zip(paths, parsed):
+                    cache.put(path, [item])
+
+    return all_results, changed
+
+
+# Servers compared when --servers is not given
+DEFAULT_SERVERS = ["nginx", "apache", "caddy", "lighttpd", "h2o"]
+
+
+def signature(data):
+    """
+    The parts of a server's response that must agree across servers.
+    resolved_uri and body_digest are only set for successful responses,
+    so they only take part in the comparison when the status codes are
+    both successes.
+    """
+    return (data.status_code, data.resolved_uri, data.body_digest)
+
+
+def group_by_signature(results_for_idx):
+    """
+    Partitions the servers that ran a test into equivalence classes of
+    identical signatures in a single pass. Returns {signature: [servers]}.
+    """
+    classes = {}
+    for server, data in results_for_idx.items():
+        if data is not None:
+            classes.setdefault(signature(data), []).append(server)
+    return classes
+
+
+def describe_divergence(idx, results_for_idx, classes):
+    """
+    Builds the single record emitted for a test whose servers fall into
+    more than one class, largest class first.
+    """
+    record = {"test_case": idx, "classes": []}
+    for (status_code, resolved_uri, body_digest), servers in sorted(classes.items(), key=lambda item: -len(item[1])):
+        entry = {"servers": servers, "status_code": status_code, "resolved_uri": resolved_uri}
+        if body_digest is not None:
+            entry["body_digest"] = body_digest
+        record["classes"].append(entry)
+
+    missing = [server for server, data in results_for_idx.items() if data is None]
+    if missing:
+        record["missing"] = missing
+
+    # Reference model resolution, when the run was made with --oracle
+    for data in results_for_idx.values():
+        if data and data.expected_uri:
+            record["expected_uri"] = data.expected_uri
+            break
+
+    return record
+
+
+def attach_sources(record, occurrences):
+    """
+    Adds a divergent test's occurrences from a sources file to its record.
+    An occurrence the oracle resolved (its own base and reference) also
+    lists the servers whose resolved URI matches the model's.
+    """
+    entries = []
+    for entry in occurrences:
+        # Older sources files list bare "file:line" strings
+        if isinstance(entry, dict) and entry.get("expected_uri"):
+            expected = path_and_query(entry["expected_uri"])
+            agreeing = [server for group in record["classes"] if group["resolved_uri"] == expected
+                        for server in group["servers"]]
+            entry = dict(entry, expected_uri=expected, agreeing_servers=agreeing)
+        entries.append(entry)
+    return dict(record, sources=entries)
+
+
+# Sort key for test IDs: numeric order for the positional IDs of older
+# runs, plain string order for content-addressed ones (all the same length)
+def test_order(test_case):
+    return len(test_case), test_case
+
+
+# Folder holding a server's results. "name@run" reads that server's results
+# from another run's subfolder, e.g. to compare its HTTP/1.1 and HTTP/3 runs.
+def server_folder(server, subfolder):
+    name, _, run = server.partition("@")
+    return f"./{name}/{run or subfolder}"
+
+
+def compare_logs_in_subfolders(output_file, subfolder, servers=DEFAULT_SERVERS, workers=None, cache=None, sources=None):
+    """
+    1. We look for the result store (or JSON files named by test ID,
+       e.g. '10f021bbfbee1b48.json') in the subfolders for each server.
+    2. We parse each record in parallel (using load_all_results).
+    3. For each test ID we group the servers by their
+       (status_code, resolved_uri, body digest) signature and write one
+       record for every test where more than one group appears.
+    With a ParseCache, only changed files are parsed and only tests that
+    were reparsed (or appeared/disappeared) since the last comparison of
+    this run are compared again; the rest reuse the cached records.
+    `sources` ({test_case: [occurrence, ...]}, as written by the test
+    scripts) adds every occurrence of each divergent test (see
+    attach_sources).
     """
 
     # Map server names to the folder where their logs live
-    server_dirs = {
-        "nginx": f"./nginx/{subfolder}",
-        "apache": f"./apache/{subfolder}",
-        "caddy": f"./caddy/{subfolder}",
-        "lighttpd": f"./lighttpd/{subfolder}",
-        "h2o": f"./h2o/{subfolder}",
-    }
+    server_dirs = {server: server_folder(server, subfolder) for server in servers}
 
     # Store the parsed results in a dict-of-dicts:
     # all_results[server][test_index] = parsed_data
-    all_results = {server: {} for server in server_dirs}
+    all_results, changed = load_all_results(server_dirs, workers, cache)
 
     # 1) Gather all test indices
     test_indices = set()
 
-    for server, folder in server_dirs.items():
-        pattern = os.path.join(folder, '*.json') 
-        for path in glob.glob(pattern): # e.g. glob("./nginx/run_1/*.json") -> ["./nginx/run_1/0.json", "./nginx/run_1/1.json", ...]
-            filename = os.path.basename(path)  # e.g. "0.json"
-            # parse out the test # from "0.json" => 0
-            match = re.match(r'^(\d+)\.json$', filename)
-            if match:
-                test_idx = int(match.group(1))
-                test_indices.add(test_idx)
-                # Parse it
-                parsed_data = parse_log_file(path)
-                # Save it in all_results
-                all_results[server][test_idx] = parsed_data
+    for server in server_dirs:
+        test_indices.update(all_results[server])
+
+    # Tests whose results may differ from the last comparison of this run
+    # (None means compare everything)
+    run = json.dumps([subfolder, servers])
+    affected = None
+    previous = cache.run_indices(run) if cache else None
+    if previous is not None:
+        cached_differences = cache.run_differences(run)
+        affected = set()
+        for server in server_dirs:
+            affected |= changed[server]
+            affected |= previous.get(server, set()) ^ set(all_results[server])
+        print(f"Comparing {len(affected)} of {len(test_indices)} tests again")
     
     differences = []
 
     # 2) Compare across servers for each test case
-    for idx in sorted(test_indices):
+    for idx in sorted(test_indices, key=test_order):
+        if affected is not None and idx not in affected:
+            if idx in cached_differences:
+                differences.append(cached_differences[idx])
+            continue
+
         results_for_idx = {}
         for server in server_dirs:
             if idx in all_results[server]:
@@ -108,45 +342,17 @@ def compare_logs_in_subfolders(output_file, subfolder):
             else:
                 print(f"{server} has no test #{idx} log file")
                 results_for_idx[server] = None
-        
-        
-
-        # Compare each server pair
-        server_names = list(server_dirs.keys())
-        for i in range(len(server_names)):
-            for j in range(i + 1, len(server_names)):
-                base = server_names[i]
-                other = server_names[j]
-                # base_data = results_for_idx[base]
-                # other_data = results_for_idx[other]
-                base_data = all_results[base].get(idx)
-                other_data = all_results[other].get(idx)
-
-                if not base_data or not other_data:
-                    continue
-
-                # Compare status codes
-                if base_data['status_code'] != other_data['status_code']:
-                    differences.append({
-                        "test_case": idx,
-                        "comparison": f"{base} vs {other}",
-                        "difference": "status_code",
-                        "base_status_code": base_data['status_code'],
-                        "other_status_code": other_data['status_code']
-                    })
-
-                # If both are success codes, compare resolved_uri
-                if (base_data['status_code'] and base_data['status_code'] < 400 and
-                    other_data['status_code'] and other_data['status_code'] < 400):
-                    if base_data['resolved_uri'] != other_data['resolved_uri']:
-                        differences.append({
-                            "test_case": idx,
-                            "comparison": f"{base} vs {other}",
-                            "difference": "resolved_uri",
-                            "base_resolved_uri": base_data['resolved_uri'],
-                            "other_resolved_uri": other_data['resolved_uri']
-                        })
+
+        classes = group_by_signature(results_for_idx)
+        if len(classes) > 1:
+            differences.append(describe_divergence(idx, results_for_idx, classes))
     
+    if cache:
+        cache.save_run(run, all_results, differences)
+
+    if sources:
+        differences = [attach_sources(record, sources.get(record["test_case"], [])) for record in differences]
+
     with open(output_file, 'w', encoding="utf-8") as output:
         json.dump(differences, output, indent=4)
 
@@ -163,9 +369,44 @@ def main():
         required=True,
         help="File to write results to."
     )
+    parser.add_argument(
+        '--servers',
+        nargs='+',
+        default=DEFAULT_SERVERS,
+        help="Server folders to compare (default: nginx apache caddy lighttpd h2o); name@run reads that server from another results_dir"
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        help="Number of parser processes (default: one per CPU)"
+    )
+    parser.add_argument(
+        '--cache',
+        default=parse_cache.DEFAULT_CACHE,
+        help="SQLite file caching parse results between runs"
+    )
+    parser.add_argument(
+        '--no_cache',
+        action='store_true',
+        help="Reparse and compare everything without reading or updating the cache"
+    )
+    parser.add_argument(
+        '--sources',
+        help="sources_<log_dir>.json written by the test script, to list where each divergent test came from (and, for --oracle runs, which servers match the model for each base)"
+    )
     args = parser.parse_args()
 
-    compare_logs_in_subfolders(args.output_file, args.results_dir)
+    sources = None
+    if args.sources:
+        with open(args.sources, 'r', encoding="utf-8") as f:
+            sources = json.load(f)
+
+    cache = None if args.no_cache else parse_cache.ParseCache(args.cache)
+    try:
+        compare_logs_in_subfolders(args.output_file, args.results_dir, args.servers, args.workers, cache, sources)
+    finally:
+        if cache:
+            cache.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,188 @@
+import json
+import os
+import struct
+import zlib
+
+# One store per server per run, written next to the legacy {i}.json logs
+STORE_FILE = "results.store"
+INDEX_FILE = "results.idx"
+
+MAGIC = b"DTRS\x01"
+# Each batch is prefixed with (compressed length, record count)
+BATCH_HEADER = struct.Struct("<II")
+DEFAULT_BATCH_SIZE = 256
+
+
+def store_path(results_dir):
+    return os.path.join(results_dir, STORE_FILE)
+
+
+def index_path(results_dir):
+    return os.path.join(results_dir, INDEX_FILE)
+
+
+def has_store(results_dir):
+    return os.path.exists(store_path(results_dir))
+
+
+class ResultWriter:
+    """
+    Appends outcome records to a single store file in zlib-compressed
+    batches of JSON lines. An offset index mapping each test case to its
+    batch is written when the store is closed. `on_flush`, if given, is
+    called with each batch of records once it has been written.
+    """
+
+    def __init__(self, results_dir, batch_size=DEFAULT_BATCH_SIZE, append=False, on_flush=None):
+        self.results_dir = results_dir
+        self.batch_size = batch_size
+        self.on_flush = on_flush
+        self.pending = []
+        self.batches = []
+        self.records = {}
+
+        os.makedirs(results_dir, exist_ok=True)
+        path = store_path(results_dir)
+        if append and os.path.exists(path):
+            # Carry the existing batches over into the new index
+            reader = ResultReader(results_dir)
+            self.batches = reader.batches
+            self.records = reader.records
+            # Drop a batch cut off mid-write by an interrupted run
+            self.file = open(path, 'r+b')
+            self.file.truncate(reader.end_offset())
+            self.file.seek(0, os.SEEK_END)
+        else:
+            self.file = open(path, 'wb')
+            self.file.write(MAGIC)
+
+    def append(self, record):
+        self.pending.append(record)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        payload = "".join(json.dumps(record) + "\n" for record in self.pending).encode("utf-8")
+        compressed = zlib.compress(payload)
+
+        offset = self.file.tell()
+        self.file.write(BATCH_HEADER.pack(len(compressed), len(self.pending)))
+        self.file.write(compressed)
+        self.file.flush()
+
+        batch = len(self.batches)
+        self.batches.append([offset, len(self.pending)])
+        for slot, record in enumerate(self.pending):
+            self.records[str(record["test_case"])] = [batch, slot]
+        flushed, self.pending = self.pending, []
+        if self.on_flush:
+            self.on_flush(flushed)
+
+    def close(self):
+        self.flush()
+        os.fsync(self.file.fileno())
+        size = self.file.tell()
+        self.file.close()
+
+        with open(index_path(self.results_dir), 'w', encoding="utf-8") as index:
+            json.dump({"size": size, "batches": self.batches, "records": self.records}, index)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ResultReader:
+    """
+    Reads a store written by ResultWriter. Uses the offset index when it
+    matches the store file, otherwise rebuilds it by scanning the batch
+    headers (e.g. after an interrupted run).
+    """
+
+    def __init__(self, results_dir):
+        self.path = store_path(results_dir)
+        self.batches = None
+        self.records = None
+
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"No result store at {self.path} (runs made with --per_test_logs have none)")
+        size = os.path.getsize(self.path)
+        try:
+            with open(index_path(results_dir), 'r', encoding="utf-8") as index:
+                data = json.load(index)
+            if data["size"] == size:
+                self.batches = data["batches"]
+                self.records = data["records"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+        if self.batches is None:
+            self._rebuild_index()
+
+    def _rebuild_index(self):
+        self.batches = []
+        self.records = {}
+        for offset, records in self._scan():
+            batch = len(self.batches)
+            self.batches.append([offset, len(records)])
+            for slot, record in enumerate(records):
+                self.records[str(record["test_case"])] = [batch, slot]
+
+    # Yield (offset, records) for every complete batch in file order
+    def _scan(self):
+        with open(self.path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{self.path} is not a result store")
+            while True:
+                offset = f.tell()
+                header = f.read(BATCH_HEADER.size)
+                if len(header) < BATCH_HEADER.size:
+                    return
+                length, _ = BATCH_HEADER.unpack(header)
+                compressed = f.read(length)
+                if len(compressed) < length:
+                    # Batch was cut off mid-write; ignore it
+                    return
+                yield offset, _decode(compressed)
+
+    def _read_batch(self, f, offset):
+        f.seek(offset)
+        length, _ = BATCH_HEADER.unpack(f.read(BATCH_HEADER.size))
+        return _decode(f.read(length))
+
+    def end_offset(self):
+        # Offset just past the last complete batch
+        if not self.batches:
+            return len(MAGIC)
+        offset = self.batches[-1][0]
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            length, _ = BATCH_HEADER.unpack(f.read(BATCH_HEADER.size))
+        return offset + BATCH_HEADER.size + length
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        with open(self.path, 'rb') as f:
+            for offset, _ in self.batches:
+                yield from self._read_batch(f, offset)
+
+    def test_cases(self):
+        return self.records.keys()
+
+    def get(self, test_case):
+        location = self.records.get(str(test_case))
+        if location is None:
+            return None
+        batch, slot = location
+        with open(self.path, 'rb') as f:
+            return self._read_batch(f, self.batches[batch][0])[slot]
+
+
+def _decode(compressed):
+    return [json.loads(line) for line in zlib.decompress(compressed).decode("utf-8").splitlines()]
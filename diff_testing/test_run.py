@@ -0,0 +1,140 @@
+import json
+import os
+import checkpoint
+import corpus
+import request_engine
+import response_cache
+import result_store
+import uri_oracle
+
+# Per-server outputs of one differential run (checkpoints, result stores or
+# per-test logs, response caches, the oracle) and the send_to_all_servers
+# jobs built on them, shared by differential_test_script.py and
+# direct_llm/extremal_diff_test_script.py
+
+
+# The server implementations, each with its base URL and the log folder
+# for log_dir under log_root (the diff_testing directory)
+def server_list(log_root, log_dir):
+    return [
+        {"name": name, "baseURL": f"http://localhost:{port}", "log_file": f"{log_root}/{name}/{log_dir}/"}
+        for name, port in [("nginx", 8080), ("apache", 8081), ("caddy", 8082), ("h2o", 8083), ("lighttpd", 8084)]
+    ]
+
+
+class TestRun:
+    """
+    Sets up every server's outputs for a run and builds its jobs.
+    open() creates each server's checkpoint (resumed with resume=True) and
+    either a result store or per-test log sink, plus a response cache view
+    when use_cache is set; close() flushes and saves them, whether or not
+    the run finished. `sources` collects every occurrence of each
+    deduplicated test ID (corpus.source_entry); with oracle=True each one
+    gets the model's resolution of its own base and reference when the
+    sources are written.
+    """
+
+    def __init__(self, build_requests, corpus_digest, per_test_logs=False, resume=False, oracle=False,
+                 use_cache=False, cache_mb=response_cache.DEFAULT_MAX_BYTES >> 20, transport="httpx"):
+        self.build_requests = build_requests
+        self.corpus_digest = corpus_digest
+        self.per_test_logs = per_test_logs
+        self.resume = resume
+        self.use_oracle = oracle
+        self.use_cache = use_cache
+        self.cache_mb = cache_mb
+        self.transport = transport
+        self.sources = {}
+        self.oracle = None
+        self.writers = []
+        self.checkpoints = []
+        self.cache = None
+        self.server_caches = {}
+        # (server, checkpoint, sink, response cache) for each server
+        self.outputs = []
+
+    def open(self, servers, running):
+        # `running` are the started containers, named after their server
+        # Compile the reference model once and share it between servers
+        self.oracle = uri_oracle.UriOracle() if self.use_oracle else None
+        if self.use_cache:
+            self.cache = response_cache.ResponseCache(max_bytes=self.cache_mb << 20)
+            images = {container.name: container.image.id for container in running}
+
+        for server in servers:
+            # Ensure the log directory exists
+            os.makedirs(server["log_file"], exist_ok=True)
+            if self.resume:
+                progress = checkpoint.Checkpoint.resume(server["log_file"], self.corpus_digest)
+            else:
+                progress = checkpoint.Checkpoint(server["log_file"], self.corpus_digest)
+                # Replace any earlier run's checkpoint before its store is overwritten
+                progress.save()
+            self.checkpoints.append(progress)
+
+            if self.per_test_logs:
+                sink = progress.wrap(request_engine.log_file_sink(server["log_file"]))
+            else:
+                # Stream every outcome into one append-only store per server,
+                # checkpointing each batch once it is written
+                writer = result_store.ResultWriter(server["log_file"], append=self.resume, on_flush=progress.complete)
+                self.writers.append(writer)
+                sink = writer.append
+                # The store itself is the record of what finished
+                progress.completed.update(writer.records)
+            if self.resume:
+                print(f"{server['name']}: resuming, {len(progress.completed)} tests already completed")
+
+            server_cache = None
+            if self.cache:
+                server_cache = self.cache.server(images[server["name"]], self.transport, server["baseURL"])
+                self.server_caches[server["name"]] = server_cache
+            self.outputs.append((server, progress, sink, server_cache))
+
+    def make_jobs(self, pairs):
+        # Jobs sending the (source, test case) pairs from pairs() to every server
+        jobs = {}
+        for server, progress, sink, server_cache in self.outputs:
+            tests = self.build_requests(server["baseURL"], pairs())
+            # Send repeats of a request once; the first server's pass maps the sources
+            tests = corpus.dedupe(tests, self.sources if not jobs else None)
+            if self.resume:
+                done = frozenset(progress.completed)
+                tests = (test for test in tests if test["test_case"] not in done)
+            if server_cache:
+                # Cached tests go straight to the sink; only misses are sent
+                tests = server_cache.filter(tests, sink)
+                sink = server_cache.wrap(sink)
+            jobs[server["name"]] = (server["baseURL"], tests, sink)
+        return jobs
+
+    def add_locations(self, test_case, locations):
+        # More places a test already in `sources` was found, with the same base
+        first = self.sources[test_case][0]
+        self.sources[test_case].extend(dict(first, location=location) for location in locations)
+
+    def print_summary(self):
+        if self.cache:
+            response_cache.print_cache_summary(self.server_caches)
+        duplicates = sum(len(locations) - 1 for locations in self.sources.values())
+        print(f"{len(self.sources)} unique tests, {duplicates} duplicates not sent")
+
+    def write_sources(self, path):
+        entries = [entry for occurrences in self.sources.values() for entry in occurrences]
+        if self.oracle:
+            resolvable = (entry for entry in entries if entry["base_uri"] is not None and entry["reference"] is not None)
+            for _ in uri_oracle.annotate_expected_uris(self.oracle, resolvable):
+                pass
+        for entry in entries:
+            # The reference is the same for every occurrence of a request
+            entry.pop("reference", None)
+        with open(path, 'w', encoding="utf-8") as f:
+            json.dump(self.sources, f)
+
+    def close(self):
+        for writer in self.writers:
+            writer.close()
+        for progress in self.checkpoints:
+            progress.save()
+        if self.cache:
+            self.cache.close()
@@ -0,0 +1,115 @@
+import math
+import json
+import argparse
+import result_store
+from response_comparison import DEFAULT_SERVERS, server_folder
+
+# Per-server latency report over the timing recorded in each result store
+
+PERCENTILES = [50, 95, 99]
+
+
+def percentile(sorted_values, q):
+    # Nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return None
+    rank = max(0, math.ceil(q / 100 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+def load_timings(folder):
+    """
+    Returns [(test_case, uri, status_code, timing)] for every outcome in a
+    server's result store that has timing recorded.
+    """
+    return [
+        (record["test_case"], record["uri"], record["status_code"], record["timing"])
+        for record in result_store.ResultReader(folder)
+        if record.get("timing") and record["timing"].get("total") is not None
+    ]
+
+
+def check_stores(parser, folders):
+    # Timing is only kept in result stores, not in --per_test_logs logs
+    for folder in folders:
+        if not result_store.has_store(folder):
+            parser.error(f"No result store in {folder}: timing needs a run made without --per_test_logs")
+
+
+def summarize(timings, slowest=10):
+    """
+    Latency percentiles (seconds) of total time, time to first byte and
+    connection setup, throughput over the run's span and the `slowest`
+    test cases by total time.
+    """
+    summary = {"requests": len(timings)}
+    for phase in ("total", "ttfb", "connect"):
+        values = sorted(t[3][phase] for t in timings if t[3].get(phase) is not None)
+        summary[phase] = {f"p{q}": percentile(values, q) for q in PERCENTILES}
+        summary[phase]["count"] = len(values)
+
+    if timings:
+        first = min(t[3]["started"] for t in timings)
+        last = max(t[3]["started"] + t[3]["total"] for t in timings)
+        summary["span"] = last - first
+        summary["throughput"] = len(timings) / summary["span"] if summary["span"] else None
+
+    ranked = sorted(timings, key=lambda t: t[3]["total"], reverse=True)[:slowest]
+    summary["slowest"] = [
+        {"test_case": test_case, "uri": uri, "status_code": status_code, "total": timing["total"], "ttfb": timing["ttfb"]}
+        for test_case, uri, status_code, timing in ranked
+    ]
+    return summary
+
+
+def format_ms(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:.2f}ms"
+
+
+def print_report(report):
+    for server, summary in report.items():
+        print(f"{server}: {summary['requests']} timed requests")
+        if not summary["requests"]:
+            continue
+        for phase in ("total", "ttfb", "connect"):
+            stats = summary[phase]
+            quantiles = "  ".join(f"p{q} {format_ms(stats[f'p{q}'])}" for q in PERCENTILES)
+            print(f"  {phase:<8} {quantiles}  (n={stats['count']})")
+        if summary.get("throughput"):
+            print(f"  throughput {summary['throughput']:.1f} req/s over {summary['span']:.2f}s")
+        print("  slowest:")
+        for entry in summary["slowest"]:
+            print(f"    {format_ms(entry['total']):>10}  test {entry['test_case']} ({entry['status_code']}): {entry['uri'][:100]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report per-server request latency of a differential testing run.")
+    parser.add_argument(
+        '--results_dir',
+        required=True,
+        help="Subdirectory the run stored its results in (e.g., run_2, varied_fs_bases)"
+    )
+    parser.add_argument(
+        '--servers',
+        nargs='+',
+        default=DEFAULT_SERVERS,
+        help="Server folders to report on (default: nginx apache caddy lighttpd h2o); name@run reads that server from another results_dir"
+    )
+    parser.add_argument('--slowest', type=int, default=10, help="Number of slowest test cases to list per server")
+    parser.add_argument('--output_file', help="Also write the report as JSON")
+    args = parser.parse_args()
+    check_stores(parser, [server_folder(server, args.results_dir) for server in args.servers])
+
+    report = {
+        server: summarize(load_timings(server_folder(server, args.results_dir)), args.slowest)
+        for server in args.servers
+    }
+    print_report(report)
+
+    if args.output_file:
+        with open(args.output_file, 'w', encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
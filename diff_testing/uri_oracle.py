@@ -0,0 +1,99 @@
+import ctypes
+import hashlib
+import itertools
+import os
+import subprocess
+
+# The reference model lives at the top of the repository
+MODEL_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "uri_model.c")
+BUILD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".oracle_build")
+CC = os.environ.get("CC", "cc")
+CFLAGS = ["-O2", "-shared", "-fPIC", "-DURI_MODEL_LIBRARY"]
+
+# Number of references resolved per FFI call when annotating test streams
+DEFAULT_CHUNK_SIZE = 4096
+
+
+def build_library(source=MODEL_SOURCE, flags=CFLAGS, build_dir=BUILD_DIR):
+    """
+    Compiles the model into a shared library and returns its path. The
+    library name includes a hash of the source and flags, so it is only
+    rebuilt when uri_model.c (or the flags) change.
+    """
+    with open(source, 'rb') as f:
+        digest = hashlib.sha256(f.read() + " ".join(flags).encode()).hexdigest()[:16]
+
+    library = os.path.join(build_dir, f"liburi_model-{digest}.so")
+    if not os.path.exists(library):
+        os.makedirs(build_dir, exist_ok=True)
+        # Build to a temporary name so a half-written library is never loaded
+        tmp = library + f".{os.getpid()}.tmp"
+        subprocess.run([CC, *flags, "-o", tmp, source], check=True)
+        os.replace(tmp, library)
+    return library
+
+
+class UriOracle:
+    """
+    In-process reference resolver backed by resolve_uri from uri_model.c.
+    """
+
+    def __init__(self, library=None):
+        self.lib = ctypes.CDLL(library or build_library())
+        self.lib.resolve_many.argtypes = [
+            ctypes.c_char_p, ctypes.POINTER(ctypes.c_char_p), ctypes.c_size_t, ctypes.POINTER(ctypes.c_void_p)
+        ]
+        self.lib.resolve_many.restype = None
+        self.lib.free_many.argtypes = [ctypes.POINTER(ctypes.c_void_p), ctypes.c_size_t]
+        self.lib.free_many.restype = None
+
+    def resolve_many(self, base, refs):
+        """
+        Resolves every reference in refs against base with a single call
+        into the model. Returns a list of resolved URIs (None where the
+        model returned NULL).
+        """
+        count = len(refs)
+        if count == 0:
+            return []
+
+        encoded = (ctypes.c_char_p * count)(*(_encode(ref) for ref in refs))
+        results = (ctypes.c_void_p * count)()
+        self.lib.resolve_many(_encode(base), encoded, count, results)
+        try:
+            return [
+                ctypes.string_at(ptr).decode("utf-8", errors="replace") if ptr else None
+                for ptr in results
+            ]
+        finally:
+            self.lib.free_many(results, count)
+
+    def resolve(self, base, ref):
+        return self.resolve_many(base, [ref])[0]
+
+
+def annotate_expected_uris(oracle, tests, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Adds the model's resolution of each test request as "expected_uri".
+    Requests carry the "base_uri" and "reference" to resolve; they are
+    resolved a chunk at a time, one model call per distinct base.
+    """
+    tests = iter(tests)
+    while True:
+        chunk = list(itertools.islice(tests, chunk_size))
+        if not chunk:
+            return
+
+        by_base = {}
+        for test in chunk:
+            by_base.setdefault(test["base_uri"], []).append(test)
+        for base, group in by_base.items():
+            resolved = oracle.resolve_many(base, [test["reference"] for test in group])
+            for test, expected_uri in zip(group, resolved):
+                test["expected_uri"] = expected_uri
+
+        yield from chunk
+
+
+def _encode(value):
+    return value.encode("utf-8", errors="surrogateescape")
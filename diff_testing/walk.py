@@ -1,5 +1,6 @@
 import os
 import json
+import argparse
 import itertools
 
 def get_files(root_path):
@@ -28,9 +29,9 @@ def generate_paths(levels, limit = 4):
     return paths
 
 
-def create_test_cases(subdirectories):
-    paths = generate_paths(subdirectories, limit = 4)
-    bases = generate_paths(subdirectories, limit = 2)
+def create_test_cases(subdirectories, depth = 4, base_depth = 2):
+    paths = generate_paths(subdirectories, limit = depth)
+    bases = generate_paths(subdirectories, limit = base_depth)
 
     tests = []
 
@@ -45,16 +46,94 @@ def create_test_cases(subdirectories):
     return tests
 
 
+# Same segment names generate_paths uses, without mutating the input set
+def path_segments(levels):
+    segments = set(levels)
+    segments.discard('.DS_Store')
+    segments.update(('.', '..'))
+    return sorted(segments)
+
+
+def iter_paths(levels, limit = 4):
+    """
+    Lazy version of generate_paths: yields every path with depth up to
+    limit, one at a time, instead of building the whole set in memory.
+    """
+    segments = path_segments(levels)
+    for depth in range(1, limit + 1):
+        for combination in itertools.product(segments, repeat=depth):
+            yield os.path.join(*combination)
+
+
+def estimate_test_count(subdirectories, depth = 4, base_depth = 2):
+    """
+    Number of test cases iter_test_cases yields for the given depths,
+    computed without generating them.
+    """
+    n = len(path_segments(subdirectories))
+    paths = sum(n ** d for d in range(1, depth + 1))
+    bases = sum(n ** d for d in range(1, base_depth + 1))
+    return bases * paths
+
+
+def iter_test_cases(subdirectories, depth = 4, base_depth = 2):
+    """
+    Lazy version of create_test_cases: yields each (base, path) test case
+    as it is generated. Segments are distinct and never contain a slash,
+    so every path (and every base) is generated exactly once and no
+    duplicate check is needed.
+    """
+    for base in iter_paths(subdirectories, limit = base_depth):
+        base_url = "http://localhost:8080/" + base
+        for path in iter_paths(subdirectories, limit = depth):
+            yield {
+                "base_uri": base_url,
+                "relative_uri": path
+            }
+
+
+# Write test cases one JSON object per line, as they are generated
+def write_jsonl(tests, output_file):
+    count = 0
+    with open(output_file, 'w') as file:
+        for test in tests:
+            file.write(json.dumps(test) + "\n")
+            count += 1
+    return count
+
+
 def main():
-    subdirectories = get_files('./model_fs')
+    parser = argparse.ArgumentParser(description="Generate relative path test cases from the model filesystem.")
+    parser.add_argument('--root', default='./model_fs', help="Filesystem to walk for path segments")
+    parser.add_argument('--depth', type=int, default=4, help="Maximum number of segments in a relative path")
+    parser.add_argument('--base_depth', type=int, default=2, help="Maximum number of segments in a base path")
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help="Generate test cases lazily and stream them to a JSONL file instead of one JSON array"
+    )
+    parser.add_argument('--output_file', help="Defaults to fs_relative_paths.json (fs_relative_paths.jsonl with --stream)")
+    parser.add_argument('--dry_run', action='store_true', help="Only print how many test cases would be generated")
+    args = parser.parse_args()
+
+    subdirectories = get_files(args.root)
     # base_url = "http://localhost:8080"
 
-    tests = create_test_cases(subdirectories)
+    if args.dry_run:
+        print(f"Would generate {estimate_test_count(subdirectories, args.depth, args.base_depth)} test cases")
+        return
+
+    if args.stream:
+        output_file = args.output_file or 'fs_relative_paths.jsonl'
+        count = write_jsonl(iter_test_cases(subdirectories, args.depth, args.base_depth), output_file)
+        print(f"Wrote {count} test cases to {output_file}")
+        return
+
+    tests = create_test_cases(subdirectories, args.depth, args.base_depth)
 
-    with open('fs_relative_paths.json', 'w') as file:
+    with open(args.output_file or 'fs_relative_paths.json', 'w') as file:
         json.dump(tests, file, indent=4)
 
 
 if __name__ == "__main__":
     main()
-    
\ No newline at end of file
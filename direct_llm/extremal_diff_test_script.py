@@ -1,136 +1,48 @@
-import httpx
-import json
-from concurrent.futures import ThreadPoolExecutor
-import docker
+import asyncio
 import os
+import sys
+import time
 import argparse
 
-DIFF_TESTING = "../diff_testing"
-CONTAINER_PORT = 80
-
-# Build docker image from dockerfile 
-def build_image(dockerfile_path, tag):
-    client = docker.from_env()
-    print(f"Building image {tag} from {dockerfile_path}")
-    image, logs = client.images.build(path=DIFF_TESTING, dockerfile=dockerfile_path, tag=tag)
-    # for log in logs:
-    #     print(log.get('stream', '').strip())
-    return image
-
-
-# Start each docker container
-def start_container(name, image, port, client):
-    container = client.containers.run(
-        image.id,
-        name=name,
-        ports={f"{CONTAINER_PORT}/tcp": port},
-        detach=True
-    )
-    print(f"Started container {name} on port {port}")
-    return container
-
-
-# Start all docker containers
-def start_all_containers():
-    client = docker.from_env()
-    # Define  server configurations
-    servers = [
-        {"name": "nginx", "dockerfile": "nginx.dockerfile", "port": 8080},
-        {"name": "apache", "dockerfile": "httpd.dockerfile", "port": 8081},
-        {"name": "caddy", "dockerfile": "caddy.dockerfile", "port": 8082},
-        {"name": "h2o", "dockerfile": "h2o.dockerfile", "port": 8083},
-        {"name": "lighttpd", "dockerfile": "lighttpd.dockerfile", "port": 8084}
-    ]
-
-    containers = []
-    for server in servers:
-        # Build the image from the Dockerfile
-        image = build_image(server["dockerfile"], server["name"])
-        container = start_container(server["name"], image, server["port"], client)
-        containers.append(container)
-
-    return containers
-
-
-# Stop and remove all docker containers
-def stop_and_remove_containers(containers):
-    for container in containers:
-        container.stop()
-        container.remove()
-        print(f"Stopped and removed container {container.name}")
-
-
-# Send HTTP GET request for each URI
-def send_http1_get_requests(baseURL, file_paths, base_log_file):
-    test_cases = []
-
-    for file_path in file_paths:
-        with open(file_path, 'r', encoding="utf-8") as file:
-            test_cases.extend(json.load(file))
-        
-    # Create a HTTP client session
-    with httpx.Client(base_url=baseURL, http1=True) as client:
-        for i, obj in enumerate(test_cases):
-            # Build the full path + query (ignore fragment)
-            full_path = obj["uri"]["path"]
-            authority = obj["uri"]["authority"]
-            if obj["uri"]["query"]:
-                full_path += "?" + obj["uri"]["query"]
-            uri = f"{obj['uri']['scheme']}://{obj['uri']['authority']}{full_path}"
-
-            log_file = base_log_file + f"{i}.json"
-            with open(log_file, 'w', encoding="utf-8") as log:
-                log.write(f"Test case {i}: {uri}\n")
-
-                try:
-                    # Send the GET request
-                    response = client.get(
-                        baseURL + full_path,
-                        headers={"Host": authority}
-                    )
-                    resolved_uri = response.url
-
-                    # Raises HTTPStatusError for 4xx/5xx responses
-                    response.raise_for_status() 
-
-                    # Log the successful response content
-                    # TODO handle if response is a directory instead of a file
-                    log.write(f"Request to {uri} completed with status code: {response.status_code}\n")
-                    log.write(f"Resolved URI: {resolved_uri}\n")
-                    # Limit dump to first 200 chars
-                    log.write(f"Response content from {uri}: {response.text[:200]}\n\n")  
-
-                except httpx.RequestError as e:
-                    # General request error (e.g., connection issues)
-                    # resolved_uri = e.response.url
-                    log.write(f"Request to {uri} failed: {str(e)}\n\n")
-                    # log.write(f"Resolved URL: {resolved_uri}\n\n")
-
-                except httpx.TimeoutException as e:
-                    # Timeout error (e.g., server took too long to respond)
-                    # resolved_uri = e.response.url
-                    log.write(f"Request to {uri} timed out: {str(e)}\n\n")
-                    # log.write(f"Resolved URL: {resolved_uri}\n\n")
-
-                except httpx.HTTPStatusError as e:
-                    # HTTP error (e.g., 404, 500, etc.)
-                    resolved_uri = e.response.url
-                    log.write(f"Request to {uri} returned error: {e.response.status_code}\n")
-                    log.write(f"Resolved URL: {resolved_uri}\n\n")
-
-                except httpx.TooManyRedirects as e:
-                    # Too many redirects error
-                    # resolved_uri = e.response.url
-                    log.write(f"Request to {uri} failed due to too many redirects: {str(e)}\n\n")
-                    # log.write(f"Resolved URL: {resolved_uri}\n\n")
-
-                except Exception as e:
-                    # Catch any other unexpected errors
-                    log.write(f"An unexpected error occurred with {uri}: {str(e)}\n\n")
-
-
-def test_server(baseURL, file_paths, log_file):
-    send_http1_get_requests(baseURL, file_paths, log_file)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "diff_testing"))
+import checkpoint
+import containers
+import corpus
+import request_engine
+import response_cache
+import test_run
+
+# Build the GET request for each (source, test case) pair, keyed by its content-addressed ID
+def build_http1_requests(baseURL, test_cases):
+    for source, obj in test_cases:
+        # Build the full path + query (ignore fragment)
+        full_path = obj["uri"]["path"]
+        authority = obj["uri"]["authority"]
+        if obj["uri"]["query"]:
+            full_path += "?" + obj["uri"]["query"]
+        uri = f"{obj['uri']['scheme']}://{obj['uri']['authority']}{full_path}"
+
+        request = {
+            "source": source,
+            "label": uri,
+            "full_uri": uri,
+            "target": baseURL + full_path,
+            # Request target for the raw transport, sent exactly as written
+            "path": full_path,
+            "headers": {"Host": authority},
+            # What the model resolves: the absolute test URI against the server
+            "base_uri": baseURL,
+            "reference": uri
+        }
+        request["test_case"] = corpus.test_id(request)
+        yield request
+
+
+# Send HTTP GET request for each test case to a single server
+def send_http1_get_requests(baseURL, file_paths, base_log_file, concurrency=request_engine.DEFAULT_CONCURRENCY):
+    tests = corpus.dedupe(build_http1_requests(baseURL, corpus.iter_sourced_test_cases(file_paths)))
+    sink = request_engine.log_file_sink(base_log_file)
+    return asyncio.run(request_engine.send_requests(baseURL, tests, sink, concurrency))
 
 
 def __main__():
@@ -139,51 +51,124 @@ def __main__():
     parser.add_argument(
         '--test_files',
         nargs='+',
-        required=True,
-        help="List of test case file paths (e.g., ./diff_testing/fs_paths.json ./test_cases/clean_tests/test2.json)"
+        help="List of test case file paths, JSON arrays or JSONL (e.g., ./diff_testing/fs_paths.json ./test_cases/clean_tests/test2.json)"
     )
     parser.add_argument(
         '--log_dir',
-        required=True,
         help="Directory to write log files to (e.g., run_2, varied_fs_bases)"
     )
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=request_engine.DEFAULT_CONCURRENCY,
+        help="Maximum number of in-flight requests per server"
+    )
+    parser.add_argument(
+        '--adaptive',
+        action='store_true',
+        help="Adapt each server's in-flight requests (AIMD), up to --concurrency (or --max_streams)"
+    )
+    parser.add_argument(
+        '--transport',
+        choices=request_engine.CONTAINER_TRANSPORTS,
+        default="httpx",
+        help="httpx client, raw pipelined sockets that send request targets byte-for-byte, or HTTP/2 (h2c) multiplexing (the containers do not serve HTTP/3)"
+    )
+    parser.add_argument(
+        '--pipeline_depth',
+        type=int,
+        default=request_engine.raw_sender.DEFAULT_PIPELINE_DEPTH,
+        help="Requests pipelined per connection with --transport raw"
+    )
+    parser.add_argument(
+        '--max_streams',
+        type=int,
+        default=request_engine.DEFAULT_MAX_STREAMS,
+        help="Concurrent streams on each server's single connection with --transport http2"
+    )
+    parser.add_argument(
+        '--per_test_logs',
+        action='store_true',
+        help="Write one {i}.json log file per test case instead of a single result store per server"
+    )
+    parser.add_argument(
+        '--oracle',
+        action='store_true',
+        help="Record the uri_model.c resolution of each test next to every server's resolved URI"
+    )
+    parser.add_argument(
+        '--response_cache',
+        action='store_true',
+        help="Answer tests from the on-disk response cache when the server's image is unchanged, caching new responses"
+    )
+    parser.add_argument(
+        '--response_cache_mb',
+        type=int,
+        default=response_cache.DEFAULT_MAX_BYTES >> 20,
+        help="Size of the response cache in MB before least recently used responses are evicted"
+    )
+    parser.add_argument(
+        '--pool',
+        action='store_true',
+        help="Keep containers running after the run and reattach to them next time"
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help="Continue an interrupted run in the same --log_dir, skipping the tests each server already completed"
+    )
+    parser.add_argument(
+        '--stop_pool',
+        action='store_true',
+        help="Stop and remove the pooled containers, then exit"
+    )
     args = parser.parse_args()
 
-    containers = []
+    if args.stop_pool:
+        containers.remove_pool()
+        return
+    if not args.test_files or not args.log_dir:
+        parser.error("--test_files and --log_dir are required")
+    if args.adaptive and args.transport == "raw":
+        parser.error("--adaptive does not apply to --transport raw")
+
+    running = []
+    run = test_run.TestRun(
+        build_http1_requests, checkpoint.corpus_hash(args.test_files),
+        per_test_logs=args.per_test_logs, resume=args.resume, oracle=args.oracle,
+        use_cache=args.response_cache, cache_mb=args.response_cache_mb, transport=args.transport
+    )
     try:
         print('Starting containers')
-        containers = start_all_containers()
-
-        # Define the different server implementations and their log files
-        servers = [
-            {"baseURL": "http://localhost:8080", "log_file": f"../diff_testing/nginx/{args.log_dir}/"},
-            {"baseURL": "http://localhost:8081", "log_file": f"../diff_testing/apache/{args.log_dir}/"},
-            {"baseURL": "http://localhost:8082", "log_file": f"../diff_testing/caddy/{args.log_dir}/"},
-            {"baseURL": "http://localhost:8083", "log_file": f"../diff_testing/h2o/{args.log_dir}/"},
-            {"baseURL": "http://localhost:8084", "log_file": f"../diff_testing/lighttpd/{args.log_dir}/"}
-        ]
-
-        for server in servers:
-            # Ensure the log directory exists
-            os.makedirs(server["log_file"], exist_ok=True)
-
-        # Use ThreadPoolExecutor to run tests
-        with ThreadPoolExecutor() as executor:
-            futures = [executor.submit(test_server, server["baseURL"], args.test_files, server["log_file"]) for server in servers]
+        # A resumed run reattaches to containers the interrupted one left running
+        running = containers.start_all_containers(pool=args.pool or args.resume)
+        run.open(test_run.server_list("../diff_testing", args.log_dir), running)
+
+        # Run every server concurrently on one event loop
+        start = time.monotonic()
+        stats = asyncio.run(request_engine.send_to_all_servers(
+            run.make_jobs(lambda: corpus.iter_sourced_test_cases(args.test_files)), args.concurrency,
+            adaptive=args.adaptive, transport=args.transport,
+            pipeline_depth=args.pipeline_depth, max_streams=args.max_streams
+        ))
+        request_engine.print_throughput_summary(stats, time.monotonic() - start)
+        run.print_summary()
+        run.write_sources(f"../diff_testing/sources_{args.log_dir}.json")
 
-            # Wait for all futures to complete
-            for future in futures:
-                future.result()
-        
         print("Tests completed")
 
     except Exception as e:
         print(f"An error occurred: {str(e)}")
 
     finally:
-        # stop and delete docker containers
-        print('Stopping containers')
-        stop_and_remove_containers(containers)
+        run.close()
+
+        if args.pool:
+            print('Leaving pooled containers running')
+        else:
+            # stop and delete docker containers
+            print('Stopping containers')
+            containers.stop_and_remove_containers(running)
     
 
 if __name__ == '__main__':
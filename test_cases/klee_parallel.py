@@ -0,0 +1,265 @@
+import os
+import sys
+import json
+import time
+import queue
+import signal
+import sqlite3
+import argparse
+import itertools
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import klee_stats
+import ktest
+import scrape
+
+# Runs several KLEE processes over uri_model_klee.c at once, each with its
+# own search strategy, seed and number of symbolic characters and pinned to
+# its own core, then merges their tests into one deduplicated corpus
+
+TEST_CASES = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SOURCE = os.path.join(TEST_CASES, "uri_model_klee.c")
+# KLEE's headers inside the klee/klee docker image
+DEFAULT_KLEE_INCLUDE = "/home/klee/klee_src/include"
+
+DEFAULT_SEARCHES = ["random-path", "nurs:covnew", "nurs:md2u", "dfs", "bfs", "random-state"]
+DEFAULT_SIZES = [6]
+DEFAULT_SEEDS = [1]
+# Exploration budget of each run
+DEFAULT_MAX_TIME = "60s"
+# Seconds between checks of a running KLEE's run.stats for --plateau
+PLATEAU_POLL_INTERVAL = 1.0
+
+# Written to the output directory next to the runs' KLEE directories
+CORPUS_FILE = "corpus.json"
+RUNS_FILE = "runs.json"
+
+
+def run_name(search, size, seed):
+    return f"{search.replace(':', '-')}_n{size}_s{seed}"
+
+
+def compile_model(source, size, build_dir, klee_include=DEFAULT_KLEE_INCLUDE):
+    """
+    Compiles `source` to LLVM bitcode with URI_LENGTH symbolic characters,
+    as in the README's clang command, reusing a build newer than the source.
+    """
+    bitcode = os.path.join(build_dir, f"uri_model_klee_n{size}.bc")
+    if os.path.exists(bitcode) and os.path.getmtime(bitcode) >= os.path.getmtime(source):
+        return bitcode
+    os.makedirs(build_dir, exist_ok=True)
+    subprocess.run(
+        ["clang", "-I", klee_include, "-emit-llvm", "-c", "-g", "-O0", "-Xclang", "-disable-O0-optnone",
+         f"-DURI_LENGTH={size}", source, "-o", bitcode],
+        check=True
+    )
+    return bitcode
+
+
+def klee_command(run, bitcode, max_time, extra_args=()):
+    return [
+        "klee", f"--output-dir={run['output_dir']}", "--libc=uclibc",
+        f"--search={run['search']}", f"--rng-initial-seed={run['seed']}",
+        f"--max-time={max_time}", *extra_args, bitcode
+    ]
+
+
+def pin_to(core):
+    # Runs in the child before exec, so KLEE only ever uses `core`
+    def pin():
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, {core})
+    return pin
+
+
+def coverage_stalled(klee_output_dir, plateau):
+    # Whether a running KLEE's covered instructions have not grown for `plateau` seconds
+    try:
+        series = klee_stats.read_run_stats(os.path.join(klee_output_dir, klee_stats.RUN_STATS_FILE), live=True)
+    except sqlite3.Error:
+        # Not written yet, or mid-write
+        return False
+    last_growth, elapsed = klee_stats.coverage_plateau(series)
+    return elapsed - last_growth >= plateau
+
+
+def run_all(runs, bitcodes, max_time, cores, extra_args=(), plateau=None):
+    """
+    Runs KLEE for every run, at most one per core at a time, each pinned to
+    a free core. With `plateau`, a run whose coverage has not grown for that
+    many seconds is interrupted (KLEE then stops exploring and writes out
+    its remaining tests). Fills in each run's exit code and elapsed time.
+    """
+    free_cores = queue.Queue()
+    for core in cores:
+        free_cores.put(core)
+
+    def run_one(run):
+        core = free_cores.get()
+        try:
+            start = time.monotonic()
+            with open(os.path.join(os.path.dirname(run["output_dir"]), run["name"] + ".log"), 'w') as log:
+                process = subprocess.Popen(
+                    klee_command(run, bitcodes[run["size"]], max_time, extra_args),
+                    stdout=log, stderr=subprocess.STDOUT, preexec_fn=pin_to(core)
+                )
+                run["stopped_at_plateau"] = False
+                while True:
+                    try:
+                        process.wait(timeout=PLATEAU_POLL_INTERVAL if plateau else None)
+                        break
+                    except subprocess.TimeoutExpired:
+                        if not run["stopped_at_plateau"] and coverage_stalled(run["output_dir"], plateau):
+                            process.send_signal(signal.SIGINT)
+                            run["stopped_at_plateau"] = True
+            run.update(core=core, returncode=process.returncode, elapsed=time.monotonic() - start)
+            note = ", coverage plateaued" if run["stopped_at_plateau"] else ""
+            print(f"{run['name']} finished on core {core} in {run['elapsed']:.1f}s (exit {process.returncode}{note})")
+        finally:
+            free_cores.put(core)
+
+    with ThreadPoolExecutor(max_workers=len(cores)) as executor:
+        list(executor.map(run_one, runs))
+
+
+def merge_runs(runs, workers=None):
+    """
+    Reads every run's .ktest files and merges them into one list of test
+    cases in run order, keeping the first of each string. Each test case
+    lists every run and .ktest file that produced it under "found_by".
+    Fills in each run's test count and how many of its tests no other run
+    found.
+    """
+    merged = {}
+    for run in runs:
+        paths = ktest.ktest_files(run["output_dir"]) if os.path.isdir(run["output_dir"]) else []
+        run["tests"] = 0
+        for path, c_string, error in ktest.read_strings(paths, workers):
+            if error:
+                print(f"Error extracting data from {path}: {error}")
+                continue
+            if not c_string:
+                continue
+            run["tests"] += 1
+            if c_string not in merged:
+                merged[c_string] = scrape.klee_test_case(c_string)
+                merged[c_string]["found_by"] = []
+            merged[c_string]["found_by"].append({"run": run["name"], "ktest": os.path.basename(path)})
+
+    for run in runs:
+        run["unique"] = 0
+    by_name = {run["name"]: run for run in runs}
+    for test in merged.values():
+        found_in = {found["run"] for found in test["found_by"]}
+        if len(found_in) == 1:
+            by_name[found_in.pop()]["unique"] += 1
+    return list(merged.values())
+
+
+def print_merge_summary(runs, tests):
+    print("Merge summary:")
+    for run in runs:
+        print(f"  {run['name']}: {run['tests']} tests, {run['unique']} found by no other run")
+    print(f"  total: {sum(run['tests'] for run in runs)} tests, {len(tests)} after deduplication")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run KLEE with several search strategies in parallel and merge their tests.")
+    parser.add_argument(
+        '--output_dir',
+        required=True,
+        help="Directory for every run's KLEE output, the merged corpus.json and runs.json (e.g., ./parallel_1)"
+    )
+    parser.add_argument(
+        '--searches',
+        nargs='+',
+        default=DEFAULT_SEARCHES,
+        help="KLEE --search strategies to run"
+    )
+    parser.add_argument(
+        '--sizes',
+        nargs='+',
+        type=int,
+        default=DEFAULT_SIZES,
+        help="Numbers of symbolic URI characters to run each strategy with"
+    )
+    parser.add_argument(
+        '--seeds',
+        nargs='+',
+        type=int,
+        default=DEFAULT_SEEDS,
+        help="KLEE random seeds to run each strategy with"
+    )
+    parser.add_argument(
+        '--max_time',
+        default=DEFAULT_MAX_TIME,
+        help="Exploration budget of each run (KLEE --max-time)"
+    )
+    parser.add_argument(
+        '--plateau',
+        type=float,
+        help="Stop a run early once its covered instructions have not grown for this many seconds"
+    )
+    parser.add_argument(
+        '--cores',
+        type=int,
+        default=os.cpu_count(),
+        help="Number of KLEE processes to run at once, one per core (default: one per CPU)"
+    )
+    parser.add_argument(
+        '--source',
+        default=DEFAULT_SOURCE,
+        help="KLEE harness to compile"
+    )
+    parser.add_argument(
+        '--klee_include',
+        default=DEFAULT_KLEE_INCLUDE,
+        help="Directory holding klee/klee.h"
+    )
+    parser.add_argument(
+        '--klee_args',
+        nargs=argparse.REMAINDER,
+        default=[],
+        help="Extra arguments for every KLEE run (must come last)"
+    )
+    parser.add_argument(
+        '--merge_only',
+        action='store_true',
+        help="Do not run KLEE; merge the KLEE directories already in --output_dir"
+    )
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    if args.merge_only:
+        runs = [
+            {"name": name, "output_dir": os.path.join(args.output_dir, name)}
+            for name in sorted(os.listdir(args.output_dir))
+            if os.path.isdir(os.path.join(args.output_dir, name)) and name != "build"
+        ]
+    else:
+        runs = [
+            {"name": run_name(search, size, seed), "search": search, "size": size, "seed": seed,
+             "output_dir": os.path.join(args.output_dir, run_name(search, size, seed))}
+            for search, size, seed in itertools.product(args.searches, args.sizes, args.seeds)
+        ]
+        # KLEE creates each output directory itself and refuses an existing one
+        existing = [run["output_dir"] for run in runs if os.path.exists(run["output_dir"])]
+        if existing:
+            parser.error(f"{existing[0]} already exists; use a new --output_dir or --merge_only")
+
+        build_dir = os.path.join(args.output_dir, "build")
+        bitcodes = {size: compile_model(args.source, size, build_dir, args.klee_include) for size in args.sizes}
+        cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count()))
+        print(f"Running {len(runs)} KLEE processes on {min(args.cores, len(cores))} cores")
+        run_all(runs, bitcodes, args.max_time, cores[:args.cores], args.klee_args, args.plateau)
+
+    tests = merge_runs(runs)
+    print_merge_summary(runs, tests)
+
+    with open(os.path.join(args.output_dir, CORPUS_FILE), 'w') as json_file:
+        json.dump(tests, json_file, indent=4)
+    with open(os.path.join(args.output_dir, RUNS_FILE), 'w') as json_file:
+        json.dump(runs, json_file, indent=4)
+    print(f"Merged corpus written to {os.path.join(args.output_dir, CORPUS_FILE)}")
@@ -0,0 +1,251 @@
+import os
+import json
+import sqlite3
+import argparse
+from array import array
+from bisect import bisect_left, bisect_right
+
+# Readers for the statistics KLEE writes next to its tests: run.istats
+# (per-instruction costs in callgrind format) and run.stats (an SQLite
+# time series of run-wide counters)
+
+ISTATS_FILE = "run.istats"
+RUN_STATS_FILE = "run.stats"
+# Functions of the URI model whose coverage is reported by default
+DEFAULT_FUNCTIONS = ["resolve_uri", "remove_dot_segments", "merge_paths_from_base"]
+# run.stats times are in microseconds
+MICROSECONDS = 1e6
+
+
+class IStats:
+    """
+    The instructions of a run.istats file, one row per instruction, kept in
+    parallel arrays: instruction id, source line, file and function (as
+    indices into `files` and `functions`) and one array per event (e.g.
+    Icov, which is 1 for a covered instruction). `function_rows` and
+    `file_rows` index the rows of each function and each file, the latter
+    sorted by line.
+    Cost lines for calls (the line after each calls=) are inclusive of the
+    callee and are left out.
+    """
+
+    def __init__(self, events):
+        self.events = events
+        self.files = []
+        self.functions = []
+        self.instr = array('I')
+        self.line = array('I')
+        self.file = array('I')
+        self.function = array('I')
+        self.costs = {event: array('q') for event in events}
+        self.function_rows = {}
+        self.file_rows = {}
+        # Line of each row in file_rows, for bisecting
+        self.file_lines = {}
+
+    def __len__(self):
+        return len(self.instr)
+
+    def build_index(self):
+        for name, rows in self.file_rows.items():
+            ordered = sorted(rows, key=self.line.__getitem__)
+            self.file_rows[name] = array('I', ordered)
+            self.file_lines[name] = array('I', (self.line[row] for row in ordered))
+
+    def rows_covered(self, rows):
+        covered = self.costs["Icov"]
+        return sum(1 for row in rows if covered[row])
+
+    def line_hits(self, rows):
+        # {line: whether any of its instructions in `rows` was covered}
+        covered = self.costs["Icov"]
+        lines = {}
+        for row in rows:
+            lines[self.line[row]] = lines.get(self.line[row], False) or bool(covered[row])
+        return lines
+
+    def function_coverage(self, function):
+        """
+        Returns {"instructions", "covered", "lines", "covered_lines"} for
+        one function, or None if it is not in the file. A line counts as
+        covered when any of its instructions is.
+        """
+        rows = self.function_rows.get(function)
+        if rows is None:
+            return None
+        lines = self.line_hits(rows)
+        return {
+            "instructions": len(rows),
+            "covered": self.rows_covered(rows),
+            "lines": len(lines),
+            "covered_lines": sum(lines.values()),
+        }
+
+    def uncovered_lines(self, function):
+        lines = self.line_hits(self.function_rows.get(function, ()))
+        return sorted(line for line, hit in lines.items() if not hit)
+
+    def line_coverage(self, file, first, last=None):
+        # (covered, total) instructions on lines first..last of `file`
+        lines = self.file_lines.get(file)
+        if lines is None:
+            return 0, 0
+        start = bisect_left(lines, first)
+        end = bisect_right(lines, first if last is None else last)
+        rows = self.file_rows[file][start:end]
+        return self.rows_covered(rows), len(rows)
+
+
+def parse_istats(path):
+    # Streams a run.istats file into an IStats
+    stats = None
+    files = {}
+    functions = {}
+    file = function = None
+    file_rows = function_rows = None
+    skip_call_cost = False
+    with open(path, 'r', encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if line[:1].isdigit():
+                if skip_call_cost:
+                    skip_call_cost = False
+                    continue
+                fields = line.split()
+                row = len(stats.instr)
+                stats.instr.append(int(fields[0]))
+                stats.line.append(int(fields[1]))
+                stats.file.append(file)
+                stats.function.append(function)
+                for costs, cost in zip(event_costs, fields[2:]):
+                    costs.append(int(cost))
+                file_rows.append(row)
+                function_rows.append(row)
+            elif line.startswith("fl="):
+                name = line[3:].rstrip("\n")
+                if name not in files:
+                    files[name] = len(stats.files)
+                    stats.files.append(name)
+                    stats.file_rows[name] = array('I')
+                file = files[name]
+                file_rows = stats.file_rows[name]
+            elif line.startswith("fn="):
+                name = line[3:].rstrip("\n")
+                if name not in functions:
+                    functions[name] = len(stats.functions)
+                    stats.functions.append(name)
+                    stats.function_rows[name] = array('I')
+                function = functions[name]
+                function_rows = stats.function_rows[name]
+            elif line.startswith("calls="):
+                skip_call_cost = True
+            elif line.startswith("events:"):
+                stats = IStats(line.split()[1:])
+                event_costs = [stats.costs[event] for event in stats.events]
+    if stats is None:
+        raise ValueError(f"{path} has no events line")
+    stats.build_index()
+    return stats
+
+
+def read_run_stats(path, live=False):
+    """
+    Returns {column: array} from a run.stats database, one entry per
+    snapshot KLEE took, in order. A finished run's database is opened as
+    immutable, so reading it leaves no -shm or -wal files next to it; pass
+    live=True while KLEE may still be writing it.
+    """
+    mode = "ro" if live else "ro&immutable=1"
+    db = sqlite3.connect(f"file:{path}?mode={mode}", uri=True)
+    try:
+        cursor = db.execute("SELECT * FROM stats ORDER BY rowid")
+        columns = [description[0] for description in cursor.description]
+        series = {column: array('d') for column in columns}
+        for row in cursor:
+            for column, value in zip(columns, row):
+                series[column].append(value if value is not None else 0)
+    finally:
+        db.close()
+    return series
+
+
+def coverage_plateau(series):
+    """
+    Returns (seconds into the run when covered instructions last grew,
+    seconds of the run so far) from read_run_stats output.
+    """
+    covered = series["CoveredInstructions"]
+    times = series["WallTime"]
+    if not covered:
+        return 0.0, 0.0
+    last_growth = 0
+    for i in range(1, len(covered)):
+        if covered[i] > covered[i - 1]:
+            last_growth = i
+    return times[last_growth] / MICROSECONDS, times[-1] / MICROSECONDS
+
+
+def summarize(klee_output_dir, functions=DEFAULT_FUNCTIONS):
+    # Coverage of `functions` and the run's coverage timeline for one KLEE directory
+    summary = {"klee_dir": klee_output_dir, "functions": {}}
+    istats_path = os.path.join(klee_output_dir, ISTATS_FILE)
+    if os.path.exists(istats_path):
+        istats = parse_istats(istats_path)
+        for function in functions:
+            summary["functions"][function] = istats.function_coverage(function)
+    run_stats_path = os.path.join(klee_output_dir, RUN_STATS_FILE)
+    if os.path.exists(run_stats_path):
+        series = read_run_stats(run_stats_path)
+        if series["CoveredInstructions"]:
+            plateau, elapsed = coverage_plateau(series)
+            summary["covered_instructions"] = int(series["CoveredInstructions"][-1])
+            summary["uncovered_instructions"] = int(series["UncoveredInstructions"][-1])
+            summary["plateau_seconds"] = plateau
+            summary["elapsed_seconds"] = elapsed
+    return summary
+
+
+def print_summaries(summaries, functions):
+    for summary in summaries:
+        print(f"{summary['klee_dir']}:")
+        if "covered_instructions" in summary:
+            print(f"  {summary['covered_instructions']} instructions covered, "
+                  f"{summary['uncovered_instructions']} uncovered; coverage last grew at "
+                  f"{summary['plateau_seconds']:.1f}s of {summary['elapsed_seconds']:.1f}s")
+        if not summary["functions"]:
+            print(f"  no {ISTATS_FILE}")
+            continue
+        for function in functions:
+            coverage = summary["functions"].get(function)
+            if coverage is None:
+                print(f"  {function}: not in {ISTATS_FILE}")
+                continue
+            percent = 100.0 * coverage["covered"] / coverage["instructions"] if coverage["instructions"] else 0.0
+            print(f"  {function}: {coverage['covered']}/{coverage['instructions']} instructions ({percent:.1f}%), "
+                  f"{coverage['covered_lines']}/{coverage['lines']} lines")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Report the coverage recorded in KLEE output directories.")
+    parser.add_argument(
+        '--klee_dirs',
+        nargs='+',
+        required=True,
+        help="KLEE output directories to report and compare (e.g., ./test1 ./test2)"
+    )
+    parser.add_argument(
+        '--functions',
+        nargs='+',
+        default=DEFAULT_FUNCTIONS,
+        help="Functions to report coverage of"
+    )
+    parser.add_argument(
+        '--output_file',
+        help="Also write the report as JSON"
+    )
+    args = parser.parse_args()
+
+    summaries = [summarize(klee_dir, args.functions) for klee_dir in args.klee_dirs]
+    print_summaries(summaries, args.functions)
+    if args.output_file:
+        with open(args.output_file, 'w') as json_file:
+            json.dump(summaries, json_file, indent=4)
@@ -0,0 +1,110 @@
+import mmap
+import os
+import struct
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+# Reader for KLEE's .ktest files, so test cases can be scraped without
+# running ktest-tool (or being inside the KLEE container)
+
+# Newer KLEE writes KTEST, older versions BOUT\n
+MAGICS = (b"KTEST", b"BOUT\n")
+# Every integer in the format is a big-endian uint32
+UINT32 = struct.Struct(">I")
+# Files parsed per worker task
+PARSE_CHUNK_SIZE = 256
+
+KTest = namedtuple('KTest', ['version', 'args', 'sym_argvs', 'sym_argv_len', 'objects'])
+
+
+def parse_ktest(data):
+    """
+    Parses the bytes of a .ktest file into a KTest whose `objects` are
+    (name, bytes) pairs in the order KLEE made them symbolic. Raises
+    ValueError if the data is not a complete .ktest file.
+    """
+    magic = bytes(data[:5])
+    if magic not in MAGICS:
+        raise ValueError("not a .ktest file")
+    pos = 5
+
+    def uint32():
+        nonlocal pos
+        value, = UINT32.unpack_from(data, pos)
+        pos += 4
+        return value
+
+    def chunk():
+        nonlocal pos
+        size = uint32()
+        if pos + size > len(data):
+            raise ValueError("truncated .ktest file")
+        value = bytes(data[pos:pos + size])
+        pos += size
+        return value
+
+    try:
+        version = uint32()
+        args = [chunk().decode("utf-8", errors="replace") for _ in range(uint32())]
+        sym_argvs = sym_argv_len = 0
+        if version >= 2:
+            sym_argvs = uint32()
+            sym_argv_len = uint32()
+        objects = []
+        for _ in range(uint32()):
+            name = chunk().decode("utf-8", errors="replace")
+            objects.append((name, chunk()))
+    except struct.error:
+        raise ValueError("truncated .ktest file")
+    return KTest(version, args, sym_argvs, sym_argv_len, objects)
+
+
+def read_ktest(path):
+    # Parses one .ktest file, mapping it into memory rather than reading it
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError("empty .ktest file")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return parse_ktest(data)
+
+
+def ktest_string(path):
+    """
+    The C string a test case spells out: every symbolic object's bytes
+    concatenated in order, with NUL bytes dropped, one character per byte
+    (what scrape.py used to rebuild from ktest-tool's output).
+    """
+    data = b"".join(value for _, value in read_ktest(path).objects)
+    return data.replace(b"\0", b"").decode("latin-1")
+
+
+def ktest_files(klee_output_dir):
+    # Sorted paths of every .ktest file in a KLEE output directory
+    return sorted(
+        os.path.join(klee_output_dir, name)
+        for name in os.listdir(klee_output_dir) if name.endswith('.ktest')
+    )
+
+
+# Worker task: (path, string or None, error or None) for each file
+def read_chunk(paths):
+    results = []
+    for path in paths:
+        try:
+            results.append((path, ktest_string(path), None))
+        except (OSError, ValueError) as e:
+            results.append((path, None, str(e)))
+    return results
+
+
+def read_strings(paths, workers=None):
+    """
+    Returns (path, string or None, error or None) for every .ktest file in
+    `paths`, in order, reading chunks of them in a process pool.
+    """
+    chunks = [paths[start:start + PARSE_CHUNK_SIZE] for start in range(0, len(paths), PARSE_CHUNK_SIZE)]
+    if len(chunks) <= 1 or (workers or os.cpu_count() or 1) <= 1:
+        # A pool only adds startup and pickling overhead for one chunk or core
+        return [result for chunk in chunks for result in read_chunk(chunk)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return [result for results in executor.map(read_chunk, chunks) for result in results]
@@ -1,7 +1,10 @@
 import os
-import subprocess
-import re
+import sys
 import json
+import argparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import ktest
 
 # Path to the KLEE output directory
 klee_output_dir = '/home/klee/klee-out-3'
@@ -9,65 +12,29 @@ klee_output_dir = '/home/klee/klee-out-3'
 # Path to the output JSON file
 output_json_file = 'klee_strings.json'
 
-# Function to convert a hex value to a character
-def hex_to_char(hex_value):
-    # Convert hex to integer and then to the corresponding character
-    return chr(int(hex_value, 16))
-
-# Function to extract the symbolic characters from a .ktest file
-def extract_c_string_from_ktest(ktest_file):
-    # Use ktest-tool to extract data from the .ktest file
-    result = subprocess.run(['ktest-tool', ktest_file], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    
-    if result.returncode != 0:
-        print(f"Error extracting data from {ktest_file}: {result.stderr}")
-        return None
-    
-    data = result.stdout.split('\n')
-
-    # Regex pattern to match lines like "object n: hex : {hex code for char}"
-    hex_pattern = re.compile(r'object \d+: hex')
-    
-    # Initialize an empty string to hold the C string
-    c_string = ""
-    
-    # Loop through each line and check if it contains the pattern
-    for line in data:
-        match = hex_pattern.search(line)
-        if match:
-            # hex_value = match.group(1)  # Extract the hex code
-            # print(line)
-            hex_value = line[-5:]
-            # print(hex_value)
-            char = hex_to_char(hex_value)  # Convert hex to char
-            # do not append null characters
-            if char != '\x00':
-                c_string += char  # Append the character to the string
-    
-    return c_string
+# Test case for one extracted C string, resolved against a fixed base
+def klee_test_case(c_string):
+    return {
+        "base_uri": "http://a.a/a",
+        "relative_uri": c_string
+    }
 
 # Function to process all .ktest files in the KLEE output directory
-def process_klee_tests(klee_output_dir):
+def process_klee_tests(klee_output_dir, workers=None):
     tests = []
-    
-    # Iterate through the KLEE output directory to find .ktest files
-    for filename in os.listdir(klee_output_dir):
-        if filename.endswith('.ktest'):
-            # print("found file")
-            ktest_file_path = os.path.join(klee_output_dir, filename)
-            # print(ktest_file_path)
-            c_string = extract_c_string_from_ktest(ktest_file_path)
-            if c_string:
-                tests.append({
-                    "base_uri": "http://a.a/a",
-                    "relative_uri": c_string
-                })
-    
+
+    # Parse the .ktest files directly, in parallel, instead of one ktest-tool run per file
+    for ktest_file_path, c_string, error in ktest.read_strings(ktest.ktest_files(klee_output_dir), workers):
+        if error:
+            print(f"Error extracting data from {ktest_file_path}: {error}")
+        elif c_string:
+            tests.append(klee_test_case(c_string))
+
     return tests
 
 # Main function to write the extracted C strings to a JSON file
-def write_strings_to_json(klee_output_dir, output_json_file):
-    tests = process_klee_tests(klee_output_dir)
+def write_strings_to_json(klee_output_dir, output_json_file, workers=None):
+    tests = process_klee_tests(klee_output_dir, workers)
     
     if tests:
         with open(output_json_file, 'w') as json_file:
@@ -76,7 +43,23 @@ def write_strings_to_json(klee_output_dir, output_json_file):
     else:
         print("No test data found.")
 
-# Run the function
-# klee_output_dir: "./testX"
-# output_json_file: "./all_tests/testX.json"
-write_strings_to_json("./testX", "./all_tests/testX.json")
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Extract the test strings from a KLEE output directory's .ktest files.")
+    parser.add_argument(
+        '--klee_dir',
+        default="./testX",
+        help="KLEE output directory (e.g., ./test1)"
+    )
+    parser.add_argument(
+        '--output_file',
+        default="./all_tests/testX.json",
+        help="JSON file to write the test cases to (e.g., ./all_tests/test1.json)"
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        help="Number of parser processes (default: one per CPU)"
+    )
+    args = parser.parse_args()
+
+    write_strings_to_json(args.klee_dir, args.output_file, args.workers)
@@ -464,37 +464,34 @@ int is_valid_uri_char(char c) {
 
 
 
+/* Number of symbolic URI characters; klee_parallel.py builds several sizes */
+#ifndef URI_LENGTH
+#define URI_LENGTH 6
+#endif
+
 int main() {
-    char uri[7];
-
-    char x0;
-    char x1;
-    char x2;
-    char x3;
-    char x4;
-    char x5;
-
-    klee_make_symbolic(&x0, sizeof(x0), "x0");
-    klee_make_symbolic(&x1, sizeof(x1), "x1");
-    klee_make_symbolic(&x2, sizeof(x2), "x2");
-    klee_make_symbolic(&x3, sizeof(x3), "x3");
-    klee_make_symbolic(&x4, sizeof(x4), "x4");
-    klee_make_symbolic(&x5, sizeof(x5), "x5");
-
-    klee_assume(is_valid_uri_char(x0));
-    klee_assume(is_valid_uri_char(x1));
-    klee_assume(is_valid_uri_char(x2));
-    klee_assume(is_valid_uri_char(x3));
-    klee_assume(is_valid_uri_char(x4));
-    klee_assume(is_valid_uri_char(x5));
-
-    uri[0] = x0;
-    uri[1] = x1;
-    uri[2] = x2;
-    uri[3] = x3;
-    uri[4] = x4;
-    uri[5] = x5;
-    uri[6] = '\0'; 
+    char uri[URI_LENGTH + 1];
+    /* One symbolic object per character, named x0, x1, ... KLEE only makes
+       a whole memory object symbolic, so each character gets its own
+       one-byte allocation rather than being a slice of uri[] */
+    char *x[URI_LENGTH];
+    char names[URI_LENGTH][12];
+
+    for (int i = 0; i < URI_LENGTH; i++) {
+        x[i] = malloc(1);
+        snprintf(names[i], sizeof(names[i]), "x%d", i);
+        klee_make_symbolic(x[i], 1, names[i]);
+    }
+
+    for (int i = 0; i < URI_LENGTH; i++) {
+        klee_assume(is_valid_uri_char(*x[i]));
+    }
+
+    for (int i = 0; i < URI_LENGTH; i++) {
+        uri[i] = *x[i];
+        free(x[i]);
+    }
+    uri[URI_LENGTH] = '\0';
 
     resolve_uri(uri);
 
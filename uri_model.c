@@ -24,7 +24,9 @@
 #include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
+#ifndef URI_MODEL_LIBRARY
 #include <klee/klee.h>
+#endif
 
 /* A small structure to hold parsed URI components. */
 typedef struct {
@@ -449,11 +451,35 @@ char *resolve_uri(char *base_uri, char *query_uri)
     return resolved;
 }
 
+#ifdef URI_MODEL_LIBRARY
+/*
+ * resolve_many: resolves every reference in refs[0..count) against the same
+ * base_uri and stores each newly allocated result in results[i].
+ *
+ * Built only into the shared library used by diff_testing/uri_oracle.py, so
+ * a whole batch of references crosses the FFI boundary in a single call.
+ * The caller releases the results with free_many.
+ */
+void resolve_many(char *base_uri, char **refs, size_t count, char **results) {
+    for (size_t i = 0; i < count; i++) {
+        results[i] = resolve_uri(base_uri, refs[i]);
+    }
+}
+
+/* free_many: frees every string returned by resolve_many. */
+void free_many(char **results, size_t count) {
+    for (size_t i = 0; i < count; i++) {
+        free(results[i]);
+        results[i] = NULL;
+    }
+}
+#else
 int main() {
     int a;
     klee_make_symbolic(&a, sizeof(a), "a");
     return get_sign(a);
 }
+#endif
 
 /* 
    Example main() for quick demo: